@@ -0,0 +1,50 @@
+from cursor import Table
+from helper import format_record, match_row
+
+class Query:
+	'''
+	One query of a batch: the rows of the table whose column satisfies a predicate
+	(predicate.Predicate). Matching rows are passed to sink, which by default keeps them in
+	rows as they would be printed by binary_search.
+	'''
+
+	def __init__(self, name, column, predicate, sink=None):
+		'''
+		INPUT: name: name of the query in the report
+			column: name (or position) of the column to check
+			predicate: predicate.Predicate the column must satisfy
+			sink: function called with every matching record (None to keep them in rows)
+		'''
+		self.name = name
+		self.column = column
+		self.predicate = predicate
+		self.rows = set()
+		if sink is None:
+			sink = lambda record: self.rows.add(format_record(record))
+		self.sink = sink
+		# Per-query counters
+		self.checked = 0
+		self.matched = 0
+
+def run_batch(file, table_name, queries):
+	'''
+	Evaluate several queries on the same table in a single traversal: every page of the table
+	is read once, and each record is checked against the predicate of every query (on the
+	encoded bytes of the column, see Record.match) and sent to the sink of each query it
+	matches. Records are decoded once, whatever the number of queries matching them.
+
+	INPUT: file: Pager over the database file to be read
+		table_name: name of the table to scan
+		queries: list of Query
+	The pages read by the traversal, shared by all the queries, are counted in file.stats.
+	'''
+	table = Table(file, table_name)
+	positions = [table.column_position(query.column) for query in queries]
+
+	for record in table.rows():
+		for query, position in zip(queries, positions):
+			query.checked += 1
+			if record.match(position, query.predicate):
+				query.matched += 1
+				match_row(file)
+				query.sink(record)
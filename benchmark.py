@@ -0,0 +1,416 @@
+import os
+import sys
+import json
+import math
+import platform
+import statistics
+import timeit
+from helper import *
+from pager import open_database
+from catalog import get_catalog
+from cursor import Table, count_matches
+from parallel import parallel_scan
+from vectorized import vectorized_scan
+from batch import Query, run_batch
+from predicate import Predicate, EQUAL, RANGE
+from stats import QueryStats, PAGE_TYPES
+from tracing import Tracer
+from pagemap import get_page_map
+from hashindex import get_hash_index
+
+# Queries of Question 3: (query type, column, keys). Keys of range queries are
+# (range_start, range_end).
+QUERIES = [
+	("scan", "Last_Name", ["Rowe         "]),
+	("equality", "Emp_ID", [181162]),
+	("range", "Emp_ID", [(171800, 171899)])
+]
+
+# Scenarios of Question 3: database file, table and queries
+PRESETS = {
+	"3a": {"db_file": "q3a_db.db", "table": "Employee", "queries": QUERIES},
+	"3b": {"db_file": "q3b_db.db", "table": "Employee", "queries": QUERIES},
+	"3c": {"db_file": "q3c_db.db", "table": "Employee", "queries": QUERIES},
+	"3d": {"db_file": "q3d_db.db", "table": "Employee", "queries": QUERIES}
+}
+
+def load_manifest(manifest_file, queries=QUERIES):
+	'''
+	Return a preset (named after the variant) for every database of a manifest written by
+	variants.py, running queries on it
+	'''
+	with open(manifest_file) as manifest:
+		variants = json.load(manifest)["variants"]
+	directory = os.path.dirname(manifest_file)
+	presets = {}
+	for variant in variants:
+		presets[variant["name"]] = {
+			"db_file": os.path.join(directory, variant["db_file"]),
+			"table": variant["table"],
+			"queries": queries
+		}
+	return presets
+
+# Ways a query can find its rows, chosen from the schema catalog
+SCAN = "scan"
+ROWID = "rowid"
+TABLE_KEY = "table key"
+INDEX = "index"
+
+def get_access_path(catalog, table_name, column):
+	'''
+	Return (access path, catalog entry of the b-tree to search) used by equality and range
+	queries on column: the rowid if the column is an alias of it, the table b-tree if the
+	table is created WITHOUT ROWID with column first in its primary key, an index whose first
+	column is column, or else a scan of the table
+	'''
+	entry = catalog.table(table_name)
+	if (entry.rowid_alias == column):
+		return ROWID, entry
+	if entry.without_rowid and entry.primary_key[:1] == [column]:
+		return TABLE_KEY, entry
+	index = catalog.find_index(table_name, [column])
+	if index is not None:
+		return INDEX, index
+	return SCAN, entry
+
+def get_predicate(range_start, range_end, encoding):
+	'''
+	Return a predicate.Predicate comparing a column to the keys of a query by their text form,
+	like binary_search does
+	'''
+	if (range_start == range_end):
+		return Predicate(EQUAL, str(range_start), encoding=encoding, as_text=True)
+	return Predicate(RANGE, str(range_start), str(range_end), encoding, as_text=True)
+
+def scan(f, db_file, table_name, column, range_start, range_end, options):
+	'''
+	Return the rows (formatted as by format_record) whose column is between range_start and
+	range_end, reading every page of the table
+	'''
+	catalog = get_catalog(f)
+	entry = catalog.table(table_name)
+	if options["use_hash_index"] and range_start == range_end:
+		# Only the pages holding rows with the hash of the key are read
+		return [format_record(record) for record in get_hash_index(f, table_name, column).lookup(range_start)]
+	if options["scan_workers"] > 1 and range_start == range_end:
+		# Spread the subtrees of the table over several processes
+		rows = parallel_scan(db_file, table_name, column, range_start, options["scan_workers"], options["use_mmap"], f.stats)
+		return [format_record(row) for row in rows]
+	if options["use_numpy"] and not entry.without_rowid:
+		return [format_record(record) for record in vectorized_scan(f, Table(f, table_name), column, range_start, range_end)]
+	if entry.rowid_alias is not None:
+		# The INTEGER PRIMARY KEY column is stored as NULL and only a Table cursor fills it in
+		# with the rowid
+		table = Table(f, table_name)
+		position = table.column_position(column)
+		predicate = get_predicate(range_start, range_end, f.encoding)
+		rows = (record for record in table.rows() if record.match(position, predicate))
+		return [format_record(record) for record in count_matches(f, rows)]
+
+	track = set()
+	if (range_start == range_end):
+		binary_search(f, entry.rootpage, catalog.column_index(table_name, column), str(range_start), track,
+			isWithoutRowID=entry.without_rowid)
+	else:
+		binary_search(f, entry.rootpage, catalog.column_index(table_name, column), None, track,
+			isWithoutRowID=entry.without_rowid, isRange=True, range_start=str(range_start), range_end=str(range_end))
+	return list(track)
+
+def search(f, db_file, table_name, column, range_start, range_end, options):
+	'''
+	Return the rows (formatted as by format_record) whose column is between range_start and
+	range_end (equal to range_start for equality queries), using the access path of the
+	column (see get_access_path)
+	'''
+	catalog = get_catalog(f)
+	table = catalog.table(table_name)
+	path, entry = get_access_path(catalog, table_name, column)
+
+	if (path == ROWID):
+		# The rowid alias column is the key of the table b-tree
+		rows = Table(f, table_name)
+		if (range_start == range_end):
+			record = rows.get(range_start)
+			return [format_record(record)] if record is not None else []
+		return [format_record(record) for record in rows.rowid_range(range_start, range_end)]
+
+	if (path == TABLE_KEY):
+		# Every column is stored in the index b-tree rooted at the table's root page
+		if (range_start == range_end):
+			record = find_by_key(f, entry.rootpage, [range_start])
+			return [format_record(record)] if record is not None else []
+		records = []
+		find_key_range(f, entry.rootpage, [range_start], [range_end], records)
+		return [format_record(record) for record in records]
+
+	if (path == INDEX):
+		# Find the rowids (or primary keys) in the index, then look the rows up in the table (only
+		# the rows are counted as matches)
+		if (range_start == range_end and entry.sql is None):
+			# Automatic indexes of PRIMARY KEY and UNIQUE constraints hold every key once
+			found = find_by_key(f, entry.rootpage, [range_start], count_rows=False)
+			entries = [found] if found is not None else []
+		else:
+			entries = []
+			find_key_range(f, entry.rootpage, [range_start], [range_end], entries, count_rows=False)
+		if table.without_rowid:
+			records = [find_by_key(f, table.rootpage, list(index_entry[len(entry.columns):])) for index_entry in entries]
+		elif (len(entries) == 1):
+			records = [find_by_rowid(f, table.rootpage, entries[0][len(entry.columns)])]
+		else:
+			records = []
+			find_by_rowids(f, table.rootpage, set(index_entry[len(entry.columns)] for index_entry in entries), records)
+		return [format_record(record) for record in records if record is not None]
+
+	return scan(f, db_file, table_name, column, range_start, range_end, options)
+
+def shared_scan(f, table_name, queries, counts=None):
+	'''
+	Return the rows of every query of a preset (list of (query type, column, key)), found in a
+	single traversal of the table (see batch.run_batch). If counts is a list, a dict of the
+	query, column, key, rows, and records checked and matched of every query is appended to it.
+	'''
+	batch = []
+	for query, column, key in queries:
+		if (query == "range"):
+			predicate = get_predicate(key[0], key[1], f.encoding)
+		else:
+			predicate = get_predicate(key, key, f.encoding)
+		batch.append(Query(query, column, predicate))
+	run_batch(f, table_name, batch)
+	if counts is not None:
+		for (query, column, key), batch_query in zip(queries, batch):
+			counts.append({"query": query, "column": column, "key": key, "rows": len(batch_query.rows),
+				"checked": batch_query.checked, "matched": batch_query.matched})
+	return [row for query in batch for row in query.rows]
+
+def run_once(f, db_file, table_name, query, column, key, options, counts=None):
+	'''
+	Run one query and return its matching rows (counts is passed to shared_scan)
+	'''
+	if (query == "shared"):
+		return shared_scan(f, table_name, key, counts)
+	if (query == "range"):
+		range_start, range_end = key
+	else:
+		range_start = range_end = key
+	if (query == "scan"):
+		return scan(f, db_file, table_name, column, range_start, range_end, options)
+	return search(f, db_file, table_name, column, range_start, range_end, options)
+
+def drop_os_cache(db_file):
+	'''
+	Ask the OS to evict the pages of the file from its page cache (where supported), so that
+	the next reads go to the disk.
+	OUTPUT: True if the pages were dropped
+	'''
+	if not hasattr(os, "posix_fadvise"):
+		return False
+	fd = os.open(db_file, os.O_RDONLY)
+	try:
+		os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+	finally:
+		os.close(fd)
+	return True
+
+def percentile(times, p):
+	'''
+	Return the p-th percentile of a list of times (nearest rank)
+	'''
+	ordered = sorted(times)
+	return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def open_file(db_file, options):
+	'''
+	Open a database file with the options of the benchmark, loading its page map (from its
+	sidecar file, see pagemap.py) if use_page_map is set
+	OUTPUT: Pager over the database file
+	'''
+	f = open_database(db_file, use_mmap=options["use_mmap"])
+	if options["use_page_map"]:
+		get_page_map(f)
+	return f
+
+def measure(db_file, table_name, query, column, key, mode, iterations, options):
+	'''
+	Run a query iterations times and return its measurements.
+
+	INPUT: db_file: path to the database file
+		table_name: name of the table to query
+		query: "scan", "equality", "range" or "shared" (key is then the list of queries)
+		column: column the query is on
+		key: value to look for, (range_start, range_end) for range queries
+		mode: "cold" to open the file again (with an empty page cache, after dropping the file
+			from the OS page cache where possible) for every iteration, or "warm" to run
+			every iteration on the same handle after a first run that is not measured
+		iterations: number of measured runs
+		options: dict of use_mmap, scan_workers, use_numpy, shared_scan, use_page_map,
+			use_hash_index, trace_dir
+	OUTPUT: dict of the measurements, as written to the JSON report
+	'''
+	times = []
+	open_times = []
+	dropped = False
+	f = None
+	if (mode == "warm"):
+		f = open_file(db_file, options)
+		run_once(f, db_file, table_name, query, column, key, options)
+
+	for _ in range(iterations):
+		if (mode == "cold"):
+			dropped = drop_os_cache(db_file)
+			# Opening the file (and loading its page map) is timed apart from the query
+			start = timeit.default_timer()
+			f = open_file(db_file, options)
+			open_times.append(timeit.default_timer() - start)
+		# Measure every run on its own
+		f.stats = QueryStats()
+		counts = [] if query == "shared" else None
+		start = timeit.default_timer()
+		rows = run_once(f, db_file, table_name, query, column, key, options, counts)
+		times.append(timeit.default_timer() - start)
+		f.stats.stop()
+		stats = f.stats.to_dict()
+		if (mode == "cold"):
+			f.close()
+	if (mode == "warm"):
+		f.close()
+
+	median = statistics.median(times)
+	return {
+		"db_file": db_file,
+		"table": table_name,
+		"query": query,
+		"column": column,
+		"key": key if query != "shared" else [list(item) for item in key],
+		"mode": mode,
+		"os_cache_dropped": dropped,
+		"iterations": iterations,
+		"rows": len(rows),
+		"latency": {
+			"min": min(times),
+			"median": median,
+			"mean": statistics.mean(times),
+			"p95": percentile(times, 95),
+			"p99": percentile(times, 99),
+			"max": max(times)
+		},
+		# Time to open the file before every cold run (None for warm runs)
+		"open_latency": {
+			"min": min(open_times),
+			"median": statistics.median(open_times),
+			"max": max(open_times)
+		} if open_times else None,
+		# Stats of the last iteration
+		"stats": stats,
+		# Rows, and records checked and matched, of every query of a shared scan in the last
+		# iteration (None for other queries)
+		"queries": counts,
+		"pages_per_second": stats["page_reads"] / median if median > 0 else None,
+		"rows_per_second": len(rows) / median if median > 0 else None,
+		"results": rows
+	}
+
+def trace(db_file, table_name, query, column, key, options, path):
+	'''
+	Run a query once more with a tracing.Tracer attached to the file, and write its page visits to
+	path + ".json" (Chrome trace events) and path + ".folded" (folded stacks)
+	'''
+	with open_file(db_file, options) as f:
+		f.tracer = Tracer()
+		run_once(f, db_file, table_name, query, column, key, options)
+		f.tracer.write_chrome_trace(path + ".json")
+		f.tracer.write_folded(path + ".folded")
+
+def run_preset(name, preset, modes, iterations, options, print_rows=False):
+	'''
+	Measure every query and key of a preset in each mode, printing a summary line per
+	measurement. OUTPUT: list of measurements (see measure)
+	'''
+	measurements = []
+	queries = [(query, column, key) for query, column, keys in preset["queries"] for key in keys]
+	if options["shared_scan"]:
+		queries = [("shared", None, queries)]
+	for number, (query, column, key) in enumerate(queries):
+		if options["trace_dir"] is not None:
+			os.makedirs(options["trace_dir"], exist_ok=True)
+			trace(preset["db_file"], preset["table"], query, column, key, options,
+				os.path.join(options["trace_dir"], name + "_" + str(number) + "_" + query))
+		for mode in modes:
+			result = measure(preset["db_file"], preset["table"], query, column, key, mode, iterations, options)
+			result["preset"] = name
+			if print_rows:
+				for row in result["results"]:
+					print(row)
+			latency = result["latency"]
+			stats = result["stats"]
+			print(name + " " + query + " " + str(column) + " " + mode + ": " + str(result["rows"]) + " rows, " +
+				"median " + str(latency["median"]) + " s, p95 " + str(latency["p95"]) + " s, p99 " +
+				str(latency["p99"]) + " s, page reads " + str(stats["page_reads"]) + " (" +
+				", ".join(page_type + " " + str(stats[page_type]) for page_type in PAGE_TYPES) + "), distinct pages " +
+				str(stats["distinct_pages"]) + ", cells decoded " + str(stats["cells_decoded"]))
+			for counts in result["queries"] or []:
+				print("  " + counts["query"] + " " + str(counts["column"]) + " " + str(counts["key"]) + ": " +
+					str(counts["rows"]) + " rows, " + str(counts["checked"]) + " checked, " + str(counts["matched"]) + " matched")
+			if not print_rows:
+				# Matching rows are only kept in the report when they are printed
+				del result["results"]
+			measurements.append(result)
+	return measurements
+
+if __name__ == "__main__":
+	#################### Input info ####################
+	# Presets to run (the preset names given on the command line, if any). A manifest written by
+	# variants.py (a path ending in .json) adds a preset for every database it lists.
+	presets = []
+	for arg in sys.argv[1:] or ["3a", "3b", "3c", "3d"]:
+		if arg.endswith(".json"):
+			manifest_presets = load_manifest(arg)
+			PRESETS.update(manifest_presets)
+			presets.extend(manifest_presets)
+		else:
+			presets.append(arg)
+	# "cold" and/or "warm" runs
+	modes = ["cold", "warm"]
+	# Number of measured runs of every query in every mode
+	iterations = 20
+	# Print the rows matched by every query (once per query and mode)
+	print_rows = False
+	# File the JSON report is written to
+	output_file = "benchmark.json"
+	options = {
+		# Memory-map the database files instead of reading them through the page cache
+		"use_mmap": False,
+		# Number of processes used by scans (1 to scan in this process only)
+		"scan_workers": 1,
+		# Match the scanned pages with NumPy (when it is installed)
+		"use_numpy": False,
+		# Run the queries of each preset in a single scan of the table
+		"shared_scan": False,
+		# Read the page types from a page map kept in a sidecar file next to every database
+		# (built on the first run)
+		"use_page_map": False,
+		# Answer equality scans (on columns with no index) from a hash index kept in a sidecar
+		# file next to every database (built on the first run)
+		"use_hash_index": False,
+		# Directory the page visits of one more run of every query are written to (None to not
+		# trace them), as <preset>_<number>_<query>.json and .folded
+		"trace_dir": None
+	}
+	####################################################
+
+	measurements = []
+	for name in presets:
+		if name not in PRESETS:
+			exit("No preset named " + name + ". Exiting.")
+		measurements.extend(run_preset(name, PRESETS[name], modes, iterations, options, print_rows))
+
+	with open(output_file, 'w') as out:
+		json.dump({
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"options": options,
+			"measurements": measurements
+		}, out, indent=4)
+	print("Report written to " + output_file)
@@ -0,0 +1,51 @@
+from helper import *
+from pager import open_database
+import timeit
+#################### Input info ####################
+# Database
+db_file = "q3a_db.db"
+# Number of times every record header is decoded by each decoder
+repeat = 5
+####################################################
+
+def decode_header_bin(data, payload_offset):
+	'''
+	Decode a record header with the binary string varints (get_varint).
+	OUTPUT: list of the content sizes of each column
+	'''
+	hdr_len_varint, hdr_offset = get_varint(data, payload_offset)
+	hdr_end = payload_offset + bin_to_dec(hdr_len_varint)
+	sizes = []
+	while hdr_offset < hdr_end:
+		varint, hdr_offset = get_varint(data, hdr_offset)
+		sizes.append(get_serial_code_size(varint))
+	return sizes
+
+def decode_header_bytes(data, payload_offset):
+	'''
+	Decode a record header with the bytes-native varints (read_record_header).
+	OUTPUT: list of the content sizes of each column
+	'''
+	serial_types, _ = read_record_header(data, payload_offset)
+	return [get_serial_type_size(serial) for serial in serial_types]
+
+with open_database(db_file) as f:
+	# Collect the record of every cell in the table leaf pages
+	records = []
+	for page in range(2, get_num_pages(f) + 1):
+		if (get_b_tree_type(f, page) != TABLE_LEAF):
+			continue
+		data = f.get_page(page)
+		offset_to_ptr_arr = offset_to_cell_ptr_arr(f, page)
+		for ptr in range(0, get_num_cells(f, page) * 2, 2):
+			cell_offset = get_cell_offset(data, offset_to_ptr_arr, ptr)
+			records.append((data, get_cell_payload_offset(data, cell_offset, TABLE_LEAF)))
+
+	for data, payload_offset in records:
+		if decode_header_bin(data, payload_offset) != decode_header_bytes(data, payload_offset):
+			exit("Decoders disagree on a record header. Exiting.")
+
+	print("Record headers: " + str(len(records)))
+	for name, decoder in (("get_varint", decode_header_bin), ("read_record_header", decode_header_bytes)):
+		time = min(timeit.repeat(lambda: [decoder(data, offset) for data, offset in records], number=1, repeat=repeat))
+		print(name + ": " + str(time) + " seconds (" + str(time / max(len(records), 1) * 1e9) + " ns per header)")
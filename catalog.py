@@ -0,0 +1,216 @@
+import re
+from helper import iter_rowid_range
+
+# Keywords starting a table constraint rather than a column definition in CREATE TABLE
+TABLE_CONSTRAINTS = ("CONSTRAINT", "PRIMARY", "UNIQUE", "CHECK", "FOREIGN")
+
+# First name (possibly quoted) in a piece of SQL
+NAME = re.compile(r'\s*("(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|[^\s(),]+)')
+
+# Declared type of a column: the words after its name, up to its first constraint
+COLUMN_TYPE = re.compile(r'\s*(.*?)\s*(?:\b(?:CONSTRAINT|PRIMARY|NOT|NULL|UNIQUE|CHECK|DEFAULT|COLLATE|REFERENCES|'
+	r'GENERATED|AS)\b|$)', re.IGNORECASE | re.DOTALL)
+
+def unquote(name):
+	'''
+	Return an SQL identifier without its quotes
+	'''
+	if name[:1] in ('"', '`', '[') and len(name) > 1:
+		return name[1:-1].replace('""', '"')
+	return name
+
+def split_definitions(sql):
+	'''
+	Return the comma separated definitions inside the first pair of parentheses of a CREATE
+	statement, and the rest of the statement after the closing parenthesis
+	'''
+	start = sql.index("(")
+	definitions = []
+	depth = 0
+	current = start + 1
+	quote = None
+	for i in range(start, len(sql)):
+		char = sql[i]
+		if quote:
+			if char == quote:
+				quote = None
+		elif char in ("'", '"', '`'):
+			quote = char
+		elif char == '[':
+			quote = ']'
+		elif char == '(':
+			depth += 1
+		elif char == ')':
+			depth -= 1
+			if depth == 0:
+				definitions.append(sql[current:i].strip())
+				return definitions, sql[i + 1:]
+		elif char == ',' and depth == 1:
+			definitions.append(sql[current:i].strip())
+			current = i + 1
+	exit("Unbalanced parentheses in schema. Exiting.")
+
+def get_name_list(definition):
+	'''
+	Return the names in the first pair of parentheses of a definition, e.g. PRIMARY KEY (a, b)
+	'''
+	names, _ = split_definitions(definition)
+	return [unquote(NAME.match(name).group(1)) for name in names]
+
+class SchemaEntry:
+	'''
+	One row of sqlite_master (type, name, tbl_name, rootpage, sql), with the column list
+	parsed from its CREATE statement.
+	'''
+
+	def __init__(self, values):
+		'''
+		INPUT: values: column values of a sqlite_master record
+		'''
+		self.type, self.name, self.tbl_name, self.rootpage, self.sql = values[:5]
+		# Column names in declared order (table) or in key order (index)
+		self.columns = []
+		# Primary key columns, and the PRIMARY KEY/UNIQUE constraints in declared order
+		# (these are the columns of the sqlite_autoindex_<table>_N indexes)
+		self.primary_key = []
+		self.unique = []
+		self.without_rowid = False
+		# Name of the INTEGER PRIMARY KEY column that is an alias of the rowid, if any
+		self.rowid_alias = None
+
+		if self.sql is None:
+			# Automatic indexes have no SQL; their columns come from their table
+			return
+		if self.type == "table":
+			self.parse_table()
+		elif self.type == "index":
+			definitions, _ = split_definitions(self.sql)
+			self.columns = [unquote(NAME.match(definition).group(1)) for definition in definitions]
+
+	def parse_table(self):
+		'''
+		Parse the columns and constraints of a CREATE TABLE statement
+		'''
+		definitions, rest = split_definitions(self.sql)
+		self.without_rowid = re.search(r'\bWITHOUT\s+ROWID\b', rest, re.IGNORECASE) is not None
+
+		integer_pk = None
+		# Name and declared type of every column by lowercase name, which decide whether a primary
+		# key is a rowid alias
+		types = {}
+		for definition in definitions:
+			match = NAME.match(definition)
+			first = match.group(1)
+			if first.upper() in TABLE_CONSTRAINTS:
+				constraint = re.search(r'\b(PRIMARY\s+KEY|UNIQUE)\b', definition, re.IGNORECASE)
+				if constraint is None:
+					continue
+				names = get_name_list(definition[constraint.end():])
+				if constraint.group(1).upper().startswith("PRIMARY"):
+					self.primary_key = names
+					integer_pk = names[0] if len(names) == 1 else None
+				self.unique.append(names)
+				continue
+
+			name = unquote(first)
+			# Constraints of the column follow the name (which may contain any keyword once quoted)
+			# and its type
+			rest = definition[match.end():]
+			types[name.lower()] = (name, " ".join(COLUMN_TYPE.match(rest).group(1).upper().split()))
+			self.columns.append(name)
+			if re.search(r'\bPRIMARY\s+KEY\b', rest, re.IGNORECASE):
+				self.primary_key = [name]
+				self.unique.append([name])
+				# PRIMARY KEY DESC on the column itself keeps the rowid separate
+				integer_pk = None if re.search(r'\bPRIMARY\s+KEY\s+DESC\b', rest, re.IGNORECASE) else name
+			elif re.search(r'\bUNIQUE\b', rest, re.IGNORECASE):
+				self.unique.append([name])
+
+		# Only a single primary key column declared with the type INTEGER becomes an alias of the
+		# rowid, whether the key is declared on the column or as a table constraint
+		# (names are case insensitive, so the key may be spelled differently from the column)
+		column = types.get(integer_pk.lower()) if integer_pk is not None else None
+		if (column is not None and column[1] == "INTEGER" and self.primary_key == [integer_pk]
+			and not self.without_rowid):
+			self.rowid_alias = column[0]
+			# The alias is the rowid itself, so it has no automatic index
+			self.unique.remove([integer_pk])
+
+	def record_columns(self):
+		'''
+		Return the column names in the order they are stored in the records of the table.
+		Tables created WITHOUT ROWID store their primary key columns first.
+		'''
+		if self.without_rowid:
+			return self.primary_key + [column for column in self.columns if column not in self.primary_key]
+		return list(self.columns)
+
+class Catalog:
+	'''
+	Schema of a database, parsed once from every record of the sqlite_master table, which
+	resolves the root pages of tables and indexes and the position of columns by name.
+	'''
+
+	def __init__(self, file):
+		'''
+		INPUT: file: Pager over the database file to be read
+		'''
+		# Version of the database the catalog was read from (see Pager.refresh)
+		self.data_version = file.data_version
+
+		# sqlite_master is the table b-tree rooted at the first page
+		file.stats.add('header_reads')
+		self.entries = [SchemaEntry(row) for _, row in iter_rowid_range(file, 0)]
+		self.tables = dict((entry.name, entry) for entry in self.entries if entry.type == "table")
+
+		for entry in self.entries:
+			if entry.type == "index" and entry.sql is None and entry.tbl_name in self.tables:
+				# Columns of sqlite_autoindex_<table>_N are those of the Nth PRIMARY KEY or
+				# UNIQUE constraint of the table
+				number = int(entry.name.rsplit("_", 1)[1])
+				constraints = self.tables[entry.tbl_name].unique
+				if number <= len(constraints):
+					entry.columns = constraints[number - 1]
+
+	def table(self, name):
+		'''
+		Return the sqlite_master entry of a table
+		'''
+		if name not in self.tables:
+			exit("No table named " + name + ". Exiting.")
+		return self.tables[name]
+
+	def indexes(self, table_name):
+		'''
+		Return the sqlite_master entries of every index on a table
+		'''
+		return [entry for entry in self.entries if entry.type == "index" and entry.tbl_name == table_name]
+
+	def find_index(self, table_name, columns):
+		'''
+		Return the entry of an index on the table whose leading columns are columns, or None
+		'''
+		for entry in self.indexes(table_name):
+			if entry.columns[:len(columns)] == list(columns):
+				return entry
+		return None
+
+	def column_index(self, table_name, column):
+		'''
+		Return the position of a column in the records of a table
+		'''
+		columns = self.table(table_name).record_columns()
+		if column not in columns:
+			exit("No column named " + column + " in " + table_name + ". Exiting.")
+		return columns.index(column)
+
+def get_catalog(file):
+	'''
+	Return the catalog of the database read by file. It is built on the first call and then
+	kept with the Pager, until the file change counter or the WAL shows that the database was
+	modified.
+	'''
+	file.refresh()
+	if file.catalog is None or file.catalog.data_version != file.data_version:
+		file.catalog = Catalog(file)
+	return file.catalog
@@ -1,7 +1,12 @@
 import sqlite3
 import csv
 import os
+import tempfile
+import timeit
+import pickle
+from itertools import islice
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 #################### Input info ####################
 csv_filename = "500000 Records.csv"
@@ -15,6 +20,29 @@ q3a_db = "q3a_db.db"
 q3b_db = "q3b_db.db"
 q3c_db = "q3c_db.db"
 q3d_db = "q3d_db.db"
+
+# Database variants: (db file, page size, Emp_ID declaration, table options)
+variants = [
+	(q3a_db, 4096, "INT", ""),
+	(q3b_db, 16384, "INT", ""),
+	(q3c_db, 4096, "INT PRIMARY KEY", ""),
+	(q3d_db, 4096, "INT PRIMARY KEY", " WITHOUT ROWID")
+]
+
+# Number of processes building the databases at the same time (1 to build them one after
+# another in this process)
+workers = min(len(variants), os.cpu_count() or 1)
+
+# Number of rows inserted by each executemany call
+batch_size = 50000
+# PRAGMAs set on the connection loading each database (journal_mode = WAL would be kept
+# by the database files)
+load_pragmas = OrderedDict([
+	("journal_mode", "OFF"),
+	("synchronous", "OFF"),
+	# Negative sizes are in KiB
+	("cache_size", -262144)
+])
 ####################################################
 
 ################# Helper Functions #################
@@ -61,137 +89,158 @@ def pad_string(s, l):
 	'''
 	return s.ljust(l)
 
-def insert_data(db_file, csv_file, table_name, column_names, max_count):
+def read_csv(csv_file, spill_file):
 	'''
-	INPUT: db_file: db file to insert contents 
-		csv_file: csv file that stores data to be inserted into db_file
-	OUTPUT: None, but a database with unique indexes will be created (even if
-		db is not indexed)
+	Read the CSV file in a single pass: keep the first row of every Emp_ID (its first col_limit
+	columns, reformatted by reformat_name) in spill_file, and find the maximum length of each column.
+	Rows are written to spill_file as pickled lists of batch_size rows.
+	INPUT: csv_file: csv file that stores data to be inserted into the databases
+		spill_file: binary file the rows to insert are written to
+	OUTPUT: (column names, OrderedDict of (column_name, max_length), number of rows kept)
 	'''
 	# Set to keep track of indexes seen before
 	seen = set()
 
-	conn = sqlite3.connect(db_file)
-	c = conn.cursor()
+	batch = []
+
+	with open(csv_file) as csv_in, open(spill_file, 'wb') as spill:
+		csv_reader = csv.reader(csv_in, delimiter=',')
 
-	with open(csv_file) as csv_file:
-		csv_reader = csv.reader(csv_file, delimiter=',')
+		# Keep track of column names
+		column_names = next(csv_reader)
+
+		# Max length of each column (Emp ID is not padded)
+		widths = [0] * col_limit
 
-		# Skip column names
-		next(csv_reader)
 		for row in csv_reader:
+			# Every row counts towards the max lengths, even if it is not inserted
+			for index in range(1, col_limit):
+				if len(row[index]) > widths[index]:
+					widths[index] = len(row[index])
 			if (row[0] not in seen):
 				# add Emp_ID to set seen
 				seen.add(row[0])
-				col = ""
-				val = ""
-				index = 0
-				for content in row[0:col_limit]:
-					col += "{col_name}, ".format(col_name=(reformat_name(column_names[index])))
-					# only pad if not Emp_ID:
-					if (index != 0):
-						# print(pad_string(reformat_name(content), max_count[column_names[index]]))
-						# print(max_count[column_names[index]])
-						val += "'{info}', ".format(info=pad_string(reformat_name(content), max_count[column_names[index]]))
-					else:
-						val += "'{info}', ".format(info=reformat_name(content))
-					# val += "'{info}', ".format(info=reformat_name(content))
-					index += 1
-				col = col[:-2]
-				val = val[:-2]
-				# print(val)
-				c.execute('INSERT INTO {tn} ({col}) VALUES ({val})'.format(tn=table_name, col=col, val=val))		
+				batch.append([reformat_name(content) for content in row[0:col_limit]])
+				if len(batch) == batch_size:
+					pickle.dump(batch, spill, pickle.HIGHEST_PROTOCOL)
+					batch = []
+		if batch:
+			pickle.dump(batch, spill, pickle.HIGHEST_PROTOCOL)
+
+	# Create dict to keep track of max length
+	max_count = OrderedDict(zip(column_names[:col_limit], widths))
+	return column_names, max_count, len(seen)
+
+def read_spill(spill_file, max_count):
+	'''
+	Generate the rows of spill_file (see read_csv), padding every column but Emp_ID to its
+	maximum length
+	'''
+	widths = list(max_count.values())[1:]
+	with open(spill_file, 'rb') as spill:
+		while True:
+			try:
+				batch = pickle.load(spill)
+			except EOFError:
+				break
+			for row in batch:
+				# only pad if not Emp_ID
+				yield [row[0]] + [pad_string(content, width) for content, width in zip(row[1:], widths)]
+
+def bulk_load(db_file, table_name, column_names, rows):
+	'''
+	Insert rows into the table with parameterized executemany calls of batch_size rows, all in
+	a single transaction, after setting the load_pragmas
+	INPUT: db_file: db file to insert contents
+		table_name: table the rows are inserted into
+		column_names: names of the columns of the rows (as in the CSV, reformatted by reformat_name)
+		rows: iterable of rows (lists of values)
+	OUTPUT: number of rows inserted
+	'''
+	# Transactions are started and committed explicitly
+	conn = sqlite3.connect(db_file, isolation_level=None)
+	c = conn.cursor()
+	for pragma, value in load_pragmas.items():
+		c.execute('PRAGMA {pragma} = {value}'.format(pragma=pragma, value=value))
+
+	cols = ", ".join(reformat_name(col) for col in column_names)
+	params = ", ".join("?" * len(column_names))
+	insert = 'INSERT INTO {tn} ({cols}) VALUES ({params})'.format(tn=table_name, cols=cols, params=params)
+
+	start = timeit.default_timer()
+	count = 0
+	rows = iter(rows)
+	c.execute('BEGIN')
+	while True:
+		batch = list(islice(rows, batch_size))
+		if not batch:
+			break
+		c.executemany(insert, batch)
+		count += len(batch)
+	c.execute('COMMIT')
+	conn.close()
+
+	elapsed = timeit.default_timer() - start
+	print(db_file + ": " + str(count) + " rows loaded in " + str(round(elapsed, 3)) + " s (" +
+		str(round(count / elapsed)) + " rows/s)")
+	return count
+
+def build_database(db_file, page_size, key_declaration, table_options, column_names, max_count, spill_file):
+	'''
+	Create one database variant and load the rows of the spill file into it (run by the worker
+	processes)
+	INPUT: db_file: db file to create
+		page_size: page size of the database
+		key_declaration: type (and constraints) of the Emp_ID column, e.g. "INT PRIMARY KEY"
+		table_options: options following the CREATE TABLE statement, e.g. " WITHOUT ROWID"
+		column_names, max_count, spill_file: as returned and written by read_csv
+	OUTPUT: number of rows inserted
+	'''
+	conn, c = create_database(db_file, page_size)
+
+	# Create table (first remove it if it exists already)
+	c.execute('DROP TABLE IF EXISTS {tn}'.format(tn=table_name))
 
+	col_declarations = ""
+	# column Emp_ID
+	col_declarations += "{nom} {key}, ".format(nom=reformat_name(column_names[0]), key=key_declaration)
+	# Rest of the columns
+	for col in column_names[1:col_limit]:
+		col_declarations += "{nom} CHAR({l}), ".format(nom=reformat_name(col), l=max_count[col])
+	col_declarations = col_declarations[:-2]
+
+	c.execute('CREATE TABLE {tn} ({cols}){options}'
+		.format(tn=table_name, cols=col_declarations, options=table_options))
 	commit_and_close(conn)
 
+	# Insert data
+	return bulk_load(db_file, table_name, column_names[:col_limit], read_spill(spill_file, max_count))
+
 ####################################################
 
-# Step 1: Find max length of each column (dict of form (column_name, max_length))
-# Open csv file to find max length of each column 
-with open(csv_filename) as csv_file:
-	csv_reader = csv.reader(csv_file, delimiter=',')
-
-	# Keep track of column names
-	column_names = next(csv_reader)
-
-	# Create dict to keep track of max length 
-	max_count = OrderedDict()
-
-	for col in column_names[:col_limit]:
-		max_count[col] = 0
-
-	# Start reading through csv file contents, skipping Emp ID
-	for row in csv_reader:
-		index = 1
-		for content in row[1:col_limit]:
-		# for content in row[1:]:
-			if len(content) > max_count[column_names[index]]:
-				max_count[column_names[index]] = len(content)
-			index += 1
-csv_file.close()
-
-# Step 2: Create the four databases as outlined in Question 3
-# Create database for 3a, 3b
-conn_a, c_a = create_database(q3a_db, 4096)
-conn_b, c_b = create_database(q3b_db, 16384)
-
-# Create table (first remove them if they exist already)
-c_a.execute('DROP TABLE IF EXISTS {tn}'.format(tn=table_name))
-c_b.execute('DROP TABLE IF EXISTS {tn}'.format(tn=table_name))
-
-col_declarations = ""
-
-# column Emp_ID
-col_declarations += "{nom} INT, ".format(nom=reformat_name(column_names[0]))
-# Rest of the columns
-for col in column_names[1:col_limit]:
-	col_declarations += "{nom} CHAR({l}), ".format(nom=reformat_name(col), l=max_count[col])
-col_declarations = col_declarations[:-2]
-
-c_a.execute('CREATE TABLE {tn} ({cols})'
-	.format(tn=table_name, cols=col_declarations))
-c_b.execute('CREATE TABLE {tn} ({cols})'
-	.format(tn=table_name, cols=col_declarations))
-
-commit_and_close(conn_a)
-commit_and_close(conn_b)
-
-# Insert data
-insert_data(q3a_db, csv_filename, table_name, column_names, max_count)
-insert_data(q3b_db, csv_filename, table_name, column_names, max_count)
-
-# Create database for 3c
-conn_c, c_c = create_database(q3c_db, 4096)
-col_declarations = ""
-# column Emp_ID
-col_declarations += "{nom} INT PRIMARY KEY, ".format(nom=reformat_name(column_names[0]))
-# Rest of the columns
-for col in column_names[1:col_limit]:
-	col_declarations += "{nom} CHAR({l}), ".format(nom=reformat_name(col), l=max_count[col])
-col_declarations = col_declarations[:-2]
-
-c_c.execute('CREATE TABLE {tn} ({cols})'
-	.format(tn=table_name, cols=col_declarations))
-
-commit_and_close(conn_c)
-
-# Insert data 
-insert_data(q3c_db, csv_filename, table_name, column_names, max_count)
-
-# # Create database for 3d
-conn_d, c_d = create_database(q3d_db, 4096)
-col_declarations = ""
-# Emp_ID
-col_declarations += "{nom} INT PRIMARY KEY, ".format(nom=reformat_name(column_names[0]))
-# Rest of the columns
-for col in column_names[1:col_limit]:
-	col_declarations += "{nom} CHAR({l}), ".format(nom=reformat_name(col), l=max_count[col])
-col_declarations = col_declarations[:-2]
-
-c_d.execute('CREATE TABLE {tn} ({cols}) WITHOUT ROWID'
-	.format(tn=table_name, cols=col_declarations))
-
-commit_and_close(conn_d)
-
-# Insert data
-insert_data(q3d_db, csv_filename, table_name, column_names, max_count)
\ No newline at end of file
+if __name__ == "__main__":
+	start = timeit.default_timer()
+
+	# Step 1: Read the csv file once, finding the max length of each column (dict of form
+	# (column_name, max_length)) and keeping the rows to insert in a spill file
+	spill_fd, spill_filename = tempfile.mkstemp(suffix=".spill")
+	os.close(spill_fd)
+	column_names, max_count, num_rows = read_csv(csv_filename, spill_filename)
+	print(str(num_rows) + " rows read from " + csv_filename)
+
+	# Step 2: Create the four databases as outlined in Question 3, each in its own process
+	# reading the spill file
+	try:
+		if workers > 1:
+			with ProcessPoolExecutor(max_workers=workers) as executor:
+				futures = [executor.submit(build_database, db_file, page_size, key_declaration, table_options,
+					column_names, max_count, spill_filename) for db_file, page_size, key_declaration, table_options in variants]
+				for future in futures:
+					future.result()
+		else:
+			for db_file, page_size, key_declaration, table_options in variants:
+				build_database(db_file, page_size, key_declaration, table_options, column_names, max_count, spill_filename)
+	finally:
+		os.remove(spill_filename)
+
+	print(str(len(variants)) + " databases built in " + str(round(timeit.default_timer() - start, 3)) + " s")
@@ -1,17 +0,0 @@
-# total page counter
-counter = 0
-
-# root page counter
-header = 0
-
-# index leaf page counter
-index_leaf = 0
-
-# index interior page counter 
-index_interior = 0
-
-# table leaf page counter
-table_leaf = 0
-
-# table interior page counter
-table_interior = 0
\ No newline at end of file
@@ -0,0 +1,166 @@
+from itertools import islice
+from catalog import get_catalog
+from helper import iter_rowid_range, iter_key_range, find_by_rowid, find_by_key, match_row
+from predicate import Predicate, EQUAL
+
+def limit_rows(rows, limit):
+	'''
+	Return the first limit rows of a generator (all of them if limit is None). The generator
+	is not advanced any further, so no page after the last returned row is read.
+	'''
+	if limit is None:
+		return rows
+	return islice(rows, limit)
+
+def count_matches(file, rows):
+	'''
+	Generate the rows of a generator, counting each one as a match in the stats (and tracer)
+	of file as it is generated
+	'''
+	for row in rows:
+		match_row(file)
+		yield row
+
+class Table:
+	'''
+	Streaming cursor over a table, found by name in the schema catalog. Rows are generated
+	one at a time as they are decoded, so memory stays constant whatever the number of
+	results, and a caller that stops early (or passes a limit) never reads the rest of the
+	table.
+	'''
+
+	def __init__(self, file, name):
+		'''
+		INPUT: file: Pager over the database file to be read
+			name: name of the table
+		'''
+		self.file = file
+		self.entry = get_catalog(file).table(name)
+		self.columns = self.entry.record_columns()
+		# Column stored as NULL because it is an alias of the rowid
+		self.rowid_alias = None
+		if self.entry.rowid_alias is not None:
+			self.rowid_alias = self.columns.index(self.entry.rowid_alias)
+
+	def column_position(self, column):
+		'''
+		Return the position of a column (given by name or position) in the records
+		'''
+		if isinstance(column, int):
+			return column
+		if column not in self.columns:
+			exit("No column named " + column + " in " + self.entry.name + ". Exiting.")
+		return self.columns.index(column)
+
+	def with_rowid(self, row_id, record):
+		'''
+		Return record with its INTEGER PRIMARY KEY column (if any) set to the rowid
+		'''
+		if self.rowid_alias is not None:
+			record.values[self.rowid_alias] = row_id
+		return record
+
+	def rows(self, range_start=None, range_end=None, page=None):
+		'''
+		Generate every record of the table in key order. For tables with a rowid, range_start
+		and range_end bound the rowids; for tables created WITHOUT ROWID, they are lists of
+		primary key values. page is the root of the subtree to read (the root of the table
+		if None).
+		'''
+		if page is None:
+			page = self.entry.rootpage
+		if self.entry.without_rowid:
+			yield from iter_key_range(self.file, page, range_start, range_end)
+			return
+		for row_id, record in iter_rowid_range(self.file, page, range_start, range_end):
+			yield self.with_rowid(row_id, record)
+
+	def scan(self, column=None, value=None, where=None, limit=None):
+		'''
+		Generate the records whose column equals value and/or for which where(record) is
+		True, in key order. With no condition, every record is generated.
+
+		INPUT: column: name (or position) of the column to compare to value
+			value: value the column must be equal to
+			where: function of a record returning True if the record should be generated
+			limit: maximum number of records to generate (None for all of them)
+		'''
+		rows = self.rows()
+		if column is not None:
+			position = self.column_position(column)
+			if position == self.rowid_alias:
+				rows = (record for record in rows if record[position] == value)
+			else:
+				# Records are matched on the encoded bytes of the column
+				predicate = Predicate(EQUAL, value, encoding=self.file.encoding)
+				rows = (record for record in rows if record.match(position, predicate))
+		if where is not None:
+			rows = (record for record in rows if where(record))
+		return limit_rows(count_matches(self.file, rows), limit)
+
+	def get(self, row_id):
+		'''
+		Return the record with the given rowid (or primary key for tables created WITHOUT
+		ROWID), or None if there is no such record
+		'''
+		if self.entry.without_rowid:
+			return find_by_key(self.file, self.entry.rootpage, [row_id])
+		record = find_by_rowid(self.file, self.entry.rootpage, row_id)
+		if record is None:
+			return None
+		return self.with_rowid(row_id, record)
+
+	def rowid_range(self, range_start, range_end, limit=None):
+		'''
+		Generate the records with range_start <= rowid <= range_end, in rowid order
+		'''
+		return limit_rows(count_matches(self.file, self.rows(range_start, range_end)), limit)
+
+class Index:
+	'''
+	Streaming cursor over an index of a table. Entries are generated one at a time in key
+	order, starting from the first entry that can match, and stop after the last one.
+	'''
+
+	def __init__(self, file, table_name, columns):
+		'''
+		INPUT: file: Pager over the database file to be read
+			table_name: name of the indexed table
+			columns: leading columns of the index to use, e.g. ["Emp_ID"]
+		'''
+		catalog = get_catalog(file)
+		self.file = file
+		self.entry = catalog.find_index(table_name, columns)
+		if self.entry is None:
+			exit("No index on " + table_name + " (" + ", ".join(columns) + "). Exiting.")
+		self.table = Table(file, table_name)
+
+	def seek(self, key, limit=None):
+		'''
+		Generate the index entries whose leading columns equal key (a list of values), in
+		key order. For tables with a rowid, the rowid of the row is the last value of each entry.
+		'''
+		return self.range(key, key, limit)
+
+	def range(self, range_start, range_end, limit=None):
+		'''
+		Generate the index entries whose leading columns are between range_start and
+		range_end (lists of values, None for no bound), in key order
+		'''
+		return limit_rows(count_matches(self.file, iter_key_range(self.file, self.entry.rootpage, range_start, range_end)), limit)
+
+	def rows(self, range_start, range_end, limit=None):
+		'''
+		Generate the table records of the index entries between range_start and range_end,
+		in key order, looking each one up in the table as soon as its entry is found
+		'''
+		def lookup():
+			for entry in iter_key_range(self.file, self.entry.rootpage, range_start, range_end):
+				if self.table.entry.without_rowid:
+					# Entries end with the primary key of the row instead of a rowid
+					record = find_by_key(self.file, self.table.entry.rootpage, entry[len(self.entry.columns):])
+				else:
+					record = self.table.get(entry[-1])
+				if record is not None:
+					yield record
+		return limit_rows(lookup(), limit)
@@ -0,0 +1,186 @@
+import os
+import timeit
+from cursor import Table
+
+# NumPy is only needed to export tables
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+# Number of rows decoded before they are converted into arrays
+CHUNK_ROWS = 65536
+
+def to_array(values):
+	'''
+	Convert the values of a column in a chunk of rows into a typed array: int64 if they are
+	all integers, float64 if they are numbers or NULL (NaN), and fixed-width bytes (UTF-8)
+	otherwise. NULLs in text columns become empty strings.
+	'''
+	kinds = set(type(value) for value in values)
+	if kinds <= {int}:
+		return np.array(values, dtype=np.int64)
+	if kinds <= {int, float, type(None)}:
+		return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+	return np.array([value if isinstance(value, bytes) else b"" if value is None else str(value).encode('utf-8')
+		for value in values], dtype=np.bytes_)
+
+def common_type(first, second):
+	'''
+	Return the dtype holding the values of arrays of both dtypes: numbers are widened to
+	float64, and become text if the other dtype is text
+	'''
+	if first.kind == 'S' or second.kind == 'S':
+		# Width of the text of any int64 or float64 is at most 32 bytes
+		widths = [dtype.itemsize if dtype.kind == 'S' else 32 for dtype in (first, second)]
+		return np.dtype('S' + str(max(widths)))
+	return np.result_type(first, second)
+
+class ColumnBuffer:
+	'''
+	Growable typed array holding one column. Its capacity is doubled when it is full, and
+	it is converted to a wider dtype when a chunk holds wider values (longer text, floats
+	in an integer column).
+	'''
+
+	def __init__(self):
+		self.array = None
+		self.size = 0
+
+	def extend(self, chunk):
+		'''
+		Append an array of values (from to_array) at the end of the column
+		'''
+		if self.array is None:
+			self.array = np.empty(max(len(chunk), CHUNK_ROWS), dtype=chunk.dtype)
+		dtype = common_type(self.array.dtype, chunk.dtype)
+		if dtype != self.array.dtype:
+			self.array = self.array.astype(dtype)
+		if self.size + len(chunk) > len(self.array):
+			grown = np.empty(max(2 * len(self.array), self.size + len(chunk)), dtype=dtype)
+			grown[:self.size] = self.array[:self.size]
+			self.array = grown
+		self.array[self.size:self.size + len(chunk)] = chunk
+		self.size += len(chunk)
+
+	def values(self):
+		'''
+		Return the array of every value appended so far
+		'''
+		if self.array is None:
+			return np.empty(0, dtype=np.int64)
+		return self.array[:self.size]
+
+class ColumnWriter:
+	'''
+	Writes one column to a .npy file, one chunk at a time. Chunks are written to a
+	temporary file as they come, and copied into the .npy file once the dtype (widest text)
+	and number of rows of the whole column are known.
+	'''
+
+	def __init__(self, path):
+		self.path = path
+		self.part = open(path + ".part", 'wb')
+		# (number of rows, dtype) of every chunk written to the temporary file
+		self.chunks = []
+
+	def extend(self, chunk):
+		self.part.write(chunk.tobytes())
+		self.chunks.append((len(chunk), chunk.dtype))
+
+	def close(self):
+		'''
+		Write the .npy file and remove the temporary file
+		'''
+		self.part.close()
+		dtype = np.dtype(np.int64)
+		if self.chunks:
+			dtype = self.chunks[0][1]
+		for _, chunk_dtype in self.chunks:
+			dtype = common_type(dtype, chunk_dtype)
+
+		with open(self.path, 'wb') as out, open(self.path + ".part", 'rb') as part:
+			np.lib.format.write_array_header_1_0(out, {
+				'descr': np.lib.format.dtype_to_descr(dtype),
+				'fortran_order': False,
+				'shape': (sum(rows for rows, _ in self.chunks),)
+			})
+			for rows, chunk_dtype in self.chunks:
+				chunk = np.frombuffer(part.read(rows * chunk_dtype.itemsize), dtype=chunk_dtype)
+				out.write(chunk.astype(dtype).tobytes())
+		os.remove(self.path + ".part")
+
+def iter_chunks(table, chunk_rows=CHUNK_ROWS):
+	'''
+	Read every leaf of a table once, and generate its rows chunk_rows at a time as a list of
+	typed arrays (one per column, see to_array), in key order
+	'''
+	num_columns = len(table.columns)
+	columns = [[] for _ in range(num_columns)]
+	for record in table.rows():
+		for position in range(num_columns):
+			# Records written before a column was added do not store it
+			columns[position].append(record[position] if position < len(record) else None)
+		if len(columns[0]) == chunk_rows:
+			yield [to_array(values) for values in columns]
+			columns = [[] for _ in range(num_columns)]
+	if columns[0]:
+		yield [to_array(values) for values in columns]
+
+def export_table(file, table_name, directory=None, chunk_rows=CHUNK_ROWS):
+	'''
+	Export every column of a table into a NumPy array, reading the table once and converting
+	its rows chunk_rows at a time.
+
+	INPUT: file: Pager over the database file to be read
+		table_name: name of the table to export
+		directory: directory to save the columns to, as <column>.npy files (None to keep
+			them in memory)
+		chunk_rows: number of rows converted at once
+	OUTPUT: dict of column name to array (or to the path of its .npy file if directory is
+		given), in the column order of the records
+	'''
+	if np is None:
+		exit("NumPy is required to export tables. Exiting.")
+	start = timeit.default_timer()
+
+	table = Table(file, table_name)
+	if directory is None:
+		buffers = [ColumnBuffer() for _ in table.columns]
+	else:
+		os.makedirs(directory, exist_ok=True)
+		buffers = [ColumnWriter(os.path.join(directory, column + ".npy")) for column in table.columns]
+
+	rows = 0
+	for chunk in iter_chunks(table, chunk_rows):
+		for buffer, array in zip(buffers, chunk):
+			buffer.extend(array)
+		rows += len(chunk[0])
+
+	if directory is None:
+		result = dict((column, buffer.values()) for column, buffer in zip(table.columns, buffers))
+	else:
+		for buffer in buffers:
+			buffer.close()
+		result = dict((column, buffer.path) for column, buffer in zip(table.columns, buffers))
+
+	time = timeit.default_timer() - start
+	print("Exported " + str(rows) + " rows in " + str(time) + " seconds")
+	if time > 0:
+		print("Rows per second: " + str(rows / time))
+	return result
+
+if __name__ == "__main__":
+	from pager import open_database
+
+	#################### Input info ####################
+	db_file = "q3a_db.db"
+	table_name = "Employee"
+	# Directory to save the .npy files to (None to only export in memory)
+	out_directory = "export"
+	####################################################
+
+	with open_database(db_file) as f:
+		columns = export_table(f, table_name, out_directory)
+		for column in columns:
+			print(column + ": " + str(columns[column]))
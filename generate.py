@@ -0,0 +1,257 @@
+import sys
+import csv
+import random
+import timeit
+from bisect import bisect_right
+from datetime import date
+from math import gcd
+
+# Columns of '500000 Records.csv'
+HEADER = ["Emp ID", "Name Prefix", "First Name", "Middle Initial", "Last Name", "Gender", "E Mail",
+	"Father's Name", "Mother's Name", "Mother's Maiden Name", "Date of Birth", "Time of Birth", "Age in Yrs.",
+	"Weight in Kgs.", "Date of Joining", "Quarter of Joining", "Half of Joining", "Year of Joining",
+	"Month of Joining", "Month Name of Joining", "Short Month", "Day of Joining", "DOW of Joining", "Short DOW",
+	"Age in Company (Years)", "Salary", "Last % Hike", "SSN", "Phone No. ", "Place Name", "County", "City",
+	"State", "Zip", "Region", "User Name", "Password"]
+
+# Keys the presets of benchmark.py look for, present in every generated file
+PROBE_EMP_ID = 181162
+PROBE_RANGE = (171800, 171899)
+PROBE_LAST_NAME = "Rowe"
+# Last names are at most this long (like in the original file, whose Last_Name column is
+# padded to 13 characters), and the row of PROBE_EMP_ID has a last name of this length
+LAST_NAME_WIDTH = 13
+LONGEST_LAST_NAME = "Wolfensberger"
+
+# Emp IDs are drawn from [FIRST_EMP_ID, FIRST_EMP_ID + max(MIN_EMP_IDS, 2 * rows))
+FIRST_EMP_ID = 100000
+MIN_EMP_IDS = 900000
+# Duplicate Emp IDs repeat one of the last RECENT_EMP_IDS new ones
+RECENT_EMP_IDS = 1024
+
+MALE_FIRST_NAMES = ["James", "John", "Robert", "Michael", "William", "David", "Richard", "Joseph", "Thomas",
+	"Charles", "Christopher", "Daniel", "Matthew", "Anthony", "Mark", "Donald", "Steven", "Paul", "Andrew",
+	"Joshua", "Kenneth", "Kevin", "Brian", "George", "Timothy", "Ronald", "Edward", "Jason", "Jeffrey", "Ryan",
+	"Jacob", "Gary", "Nicholas", "Eric", "Jonathan", "Stephen", "Larry", "Justin", "Scott", "Brandon",
+	"Antonio", "Reggie", "Alec", "Sebastian", "Elisha", "Todd", "Clark", "Everette", "Nicolas", "Jerrod"]
+FEMALE_FIRST_NAMES = ["Mary", "Patricia", "Jennifer", "Linda", "Elizabeth", "Barbara", "Susan", "Jessica",
+	"Sarah", "Karen", "Lisa", "Nancy", "Betty", "Margaret", "Sandra", "Ashley", "Kimberly", "Emily", "Donna",
+	"Michelle", "Carol", "Amanda", "Dorothy", "Melissa", "Deborah", "Stephanie", "Rebecca", "Sharon", "Laura",
+	"Cynthia", "Kathleen", "Amy", "Angela", "Shirley", "Anna", "Brenda", "Pamela", "Emma", "Nicole", "Helen",
+	"Hermila", "Cathrine", "Clarisa", "Moira", "Crista", "Sol", "Nu", "Tammy", "Gloria", "Ruth"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+	"Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson",
+	"Martin", "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+	"Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores", "Green",
+	"Adams", "Nelson", "Baker", "Hall", "Rivera", "Campbell", "Mitchell", "Carter", "Roberts", "Suhr", "Joy",
+	"Moores", "Rittenhouse", "Doughty", "Bottom", "Hinojosa", "Gagliardi", "Paden", "Clanton", "Abron", "Yuhas",
+	"Christiansen", "Higginbotham", "Vanderpool", "Montgomery", "Fitzgerald", "Blankenship", "Kowalczyk"]
+# Syllables of the generated last names that follow LAST_NAMES
+NAME_STARTS = ["Ab", "Bar", "Cal", "Dun", "El", "Fair", "Gal", "Har", "Ing", "Kel", "Lang", "Mar", "Nor",
+	"Ock", "Pem", "Quin", "Rad", "Stan", "Thorn", "Ush", "Van", "Wes", "Yar", "Zel"]
+NAME_ENDS = ["ley", "ford", "ton", "well", "wood", "by", "ridge", "more", "stone", "field", "worth", "man",
+	"son", "berg", "dale", "hurst", "wick", "croft", "mont", "shaw"]
+PREFIXES = {"M": ["Mr.", "Dr.", "Prof.", "Hon."], "F": ["Ms.", "Mrs.", "Dr.", "Prof.", "Hon.", "Drs."]}
+DOMAINS = ["gmail.com", "yahoo.com", "hotmail.com", "aol.com", "outlook.com", "msn.com", "ibm.com",
+	"apple.com", "microsoft.com", "walmart.com", "verizon.net", "sbcglobal.net", "comcast.net", "yahoo.co.uk"]
+# (Place Name, County, City, State, Zip, Region)
+PLACES = [("Peach Orchard", "Clay", "Peach Orchard", "AR", "72453", "South"),
+	("Rocky Ford", "Screven", "Rocky Ford", "GA", "30455", "South"),
+	("Antwerp", "Jefferson", "Antwerp", "NY", "13608", "Northeast"),
+	("Milledgeville", "Milledgeville", "Milledgeville", "GA", "31059", "South"),
+	("Springfield", "Greene", "Springfield", "MO", "65809", "Midwest"),
+	("Denver", "Denver", "Denver", "CO", "80202", "West"),
+	("Portland", "Multnomah", "Portland", "OR", "97205", "West"),
+	("Boston", "Suffolk", "Boston", "MA", "02108", "Northeast"),
+	("Madison", "Dane", "Madison", "WI", "53703", "Midwest"),
+	("Austin", "Travis", "Austin", "TX", "78701", "South"),
+	("Fresno", "Fresno", "Fresno", "CA", "93721", "West"),
+	("Erie", "Erie", "Erie", "PA", "16501", "Northeast")]
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+	"October", "November", "December"]
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+PASSWORD_CHARACTERS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!#$%&()*+-:;<=>?@[]^_{|}~"
+
+# Ages and dates of joining are computed on this day
+REFERENCE_DATE = date(2017, 8, 1)
+FIRST_BIRTH_DATE = date(1955, 1, 1).toordinal()
+LAST_BIRTH_DATE = date(1995, 12, 31).toordinal()
+FIRST_JOINING_DATE = date(1980, 1, 1).toordinal()
+
+def get_last_names():
+	'''
+	Return the vocabulary of last names: LAST_NAMES followed by names made of two syllables,
+	at most LAST_NAME_WIDTH long. PROBE_LAST_NAME is left out, so that only the rows generated
+	for it have this last name.
+	'''
+	names = list(LAST_NAMES)
+	for start in NAME_STARTS:
+		for end in NAME_ENDS:
+			names.append(start + end)
+	return [name for name in names if len(name) <= LAST_NAME_WIDTH and name != PROBE_LAST_NAME]
+
+def format_date(day):
+	return str(day.month) + "/" + str(day.day) + "/" + str(day.year)
+
+class Generator:
+	'''
+	Generates rows with the columns of '500000 Records.csv' from a seed. Everything needed to
+	generate the next row is a few fixed-size tables, so any number of rows is generated in
+	constant memory, and the same settings always generate the same rows.
+	'''
+
+	def __init__(self, rows, seed=0, last_name_skew=1.0, duplicate_rate=0.0, probe_last_name_rows=10):
+		'''
+		INPUT: rows: number of rows to generate (duplicates included)
+			seed: seed of the random number generator
+			last_name_skew: exponent of the Zipf distribution of last names (0 for uniform; the
+				larger it is, the more rows share the most frequent last names)
+			duplicate_rate: probability that a row repeats the Emp ID of an earlier row
+			probe_last_name_rows: number of rows with the last name PROBE_LAST_NAME
+		'''
+		self.random = random.Random(seed)
+		self.rows = rows
+		self.duplicate_rate = duplicate_rate
+
+		# Last names in a random order, the first ones being the most frequent
+		self.last_names = get_last_names()
+		self.random.shuffle(self.last_names)
+		weights = [1 / (rank + 1) ** last_name_skew for rank in range(len(self.last_names))]
+		self.cum_weights = []
+		total = 0
+		for weight in weights:
+			total += weight
+			self.cum_weights.append(total)
+
+		# Guaranteed rows, spread evenly over the file: (Emp ID or None for a new one, last name or None)
+		probes = [(PROBE_EMP_ID, LONGEST_LAST_NAME)]
+		probes += [(emp_id, None) for emp_id in range(PROBE_RANGE[0], PROBE_RANGE[1] + 1)]
+		probes += [(None, PROBE_LAST_NAME)] * probe_last_name_rows
+		if rows < len(probes):
+			exit("At least " + str(len(probes)) + " rows are needed for the probe keys. Exiting.")
+		self.probes = dict(((2 * k + 1) * rows // (2 * len(probes)), probe) for k, probe in enumerate(probes))
+		self.probe_ids = set(emp_id for emp_id, _ in probes if emp_id is not None)
+
+		# New Emp IDs are a permutation of the ID space: FIRST_EMP_ID + (a * n + c) mod size for
+		# n = 0, 1, 2... is never the same twice when a and size are coprime
+		self.id_space = max(MIN_EMP_IDS, 2 * rows)
+		self.multiplier = self.random.randrange(self.id_space // 3, self.id_space)
+		while gcd(self.multiplier, self.id_space) != 1:
+			self.multiplier += 1
+		self.increment = self.random.randrange(self.id_space)
+		self.next_id = 0
+		self.recent_ids = []
+
+	def new_emp_id(self):
+		'''
+		Return the next Emp ID of the permutation that is not a probe key
+		'''
+		while True:
+			emp_id = FIRST_EMP_ID + (self.multiplier * self.next_id + self.increment) % self.id_space
+			self.next_id += 1
+			if emp_id not in self.probe_ids:
+				break
+		# Keep it as a candidate for duplicates
+		if len(self.recent_ids) < RECENT_EMP_IDS:
+			self.recent_ids.append(emp_id)
+		else:
+			self.recent_ids[self.next_id % RECENT_EMP_IDS] = emp_id
+		return emp_id
+
+	def make_row(self, emp_id, last_name):
+		'''
+		Return a row (list of strings in the order of HEADER) of a random employee
+		'''
+		# Everything is drawn from random() (randint and choice are several times slower)
+		uniform = self.random.random
+		def pick(items):
+			return items[int(uniform() * len(items))]
+		def between(low, high):
+			return low + int(uniform() * (high - low + 1))
+
+		if last_name is None:
+			last_name = self.last_names[bisect_right(self.cum_weights, uniform() * self.cum_weights[-1])]
+		gender = "F" if uniform() < 0.5 else "M"
+		first_name = pick(FEMALE_FIRST_NAMES if gender == "F" else MALE_FIRST_NAMES)
+		middle = chr(65 + int(uniform() * 26))
+
+		birth = date.fromordinal(between(FIRST_BIRTH_DATE, LAST_BIRTH_DATE))
+		# Joined at 21 at the earliest
+		earliest = max(FIRST_JOINING_DATE, birth.toordinal() + 7671)
+		joining = date.fromordinal(between(earliest, REFERENCE_DATE.toordinal()))
+		seconds = int(uniform() * 86400)
+		hour = seconds // 3600
+		time_of_birth = "%02d:%02d:%02d %s" % ((hour + 11) % 12 + 1, seconds // 60 % 60, seconds % 60,
+			"AM" if hour < 12 else "PM")
+
+		place = pick(PLACES)
+		password = "".join(self.random.choices(PASSWORD_CHARACTERS, k=between(8, 14)))
+		return [
+			str(emp_id), pick(PREFIXES[gender]), first_name, middle, last_name, gender,
+			first_name.lower() + "." + last_name.lower() + "@" + pick(DOMAINS),
+			pick(MALE_FIRST_NAMES) + " " + last_name, pick(FEMALE_FIRST_NAMES) + " " + last_name,
+			pick(self.last_names), format_date(birth), time_of_birth,
+			str(round((REFERENCE_DATE - birth).days / 365.25, 2)), str(between(40, 90)),
+			format_date(joining), "Q" + str((joining.month - 1) // 3 + 1), "H1" if joining.month <= 6 else "H2",
+			str(joining.year), str(joining.month), MONTH_NAMES[joining.month - 1], MONTH_NAMES[joining.month - 1][:3],
+			str(joining.day), DAY_NAMES[joining.weekday()], DAY_NAMES[joining.weekday()][:3],
+			str(round((REFERENCE_DATE - joining).days / 365.25, 2)), str(between(40000, 200000)),
+			str(between(0, 30)) + "%",
+			"%03d-%02d-%04d" % (between(100, 899), between(1, 99), between(1, 9999)),
+			"%03d-%03d-%04d" % (between(201, 989), between(200, 999), between(0, 9999)),
+			place[0], place[1], place[2], place[3], place[4], place[5],
+			(first_name[0] + middle + last_name).lower(), password
+		]
+
+	def __iter__(self):
+		'''
+		Generate the rows one at a time
+		'''
+		for position in range(self.rows):
+			probe = self.probes.get(position)
+			if probe is not None:
+				emp_id, last_name = probe
+				if emp_id is None:
+					emp_id = self.new_emp_id()
+			elif self.recent_ids and self.random.random() < self.duplicate_rate:
+				# Repeat a recent Emp ID (only the first row of an Emp ID is loaded by commands.py)
+				emp_id, last_name = self.recent_ids[int(self.random.random() * len(self.recent_ids))], None
+			else:
+				emp_id, last_name = self.new_emp_id(), None
+			yield self.make_row(emp_id, last_name)
+
+def write_csv(csv_file, generator):
+	'''
+	Write the header and the rows of a Generator to csv_file, one row at a time
+	OUTPUT: number of rows written
+	'''
+	start = timeit.default_timer()
+	count = 0
+	with open(csv_file, 'w', newline='') as out:
+		writer = csv.writer(out)
+		writer.writerow(HEADER)
+		for row in generator:
+			writer.writerow(row)
+			count += 1
+	elapsed = timeit.default_timer() - start
+	print(csv_file + ": " + str(count) + " rows written in " + str(round(elapsed, 3)) + " s (" +
+		str(round(count / elapsed)) + " rows/s)")
+	return count
+
+if __name__ == "__main__":
+	#################### Input info ####################
+	# Number of rows (the first command line argument, if any)
+	rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+	# File the rows are written to (the second command line argument, if any)
+	output_file = sys.argv[2] if len(sys.argv) > 2 else "synthetic.csv"
+	# Seed of the random number generator: the same settings always give the same file
+	seed = 0
+	# Exponent of the Zipf distribution of last names (0 for uniform)
+	last_name_skew = 1.0
+	# Probability that a row repeats the Emp ID of an earlier row
+	duplicate_rate = 0.01
+	# Number of rows with the last name looked for by the scan queries
+	probe_last_name_rows = 10
+	####################################################
+
+	write_csv(output_file, Generator(rows, seed, last_name_skew, duplicate_rate, probe_last_name_rows))
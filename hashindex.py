@@ -0,0 +1,336 @@
+import os
+import re
+import mmap
+import zlib
+import struct
+from array import array
+from helper import *
+from cursor import Table
+from pagemap import get_key
+
+# Sidecar file (in the byte order of the machine that wrote it): header, then the pages holding
+# records with their checksum (see get_page_checksum), the overflow pages of their cells with the
+# page each one belongs to, the start of every bucket in the entries, the hash, page and cell of
+# every entry (grouped by bucket), the type of every page holding records, and the rowid of every
+# entry
+HASH_INDEX_MAGIC = b"SQLHIDX2"
+# magic, key (see pagemap.get_key), root page, column position, number of pages, number of
+# overflow pages, number of buckets, number of entries
+HASH_INDEX_HEADER = struct.Struct('=8s5IQ6I')
+
+def get_value_key(value):
+	'''
+	Return the bytes hashed for a column value: values are compared by their text form, like
+	binary_search does, so that 181162 and '181162' are the same key
+	'''
+	if isinstance(value, bytes):
+		return value
+	return str(value).encode('utf-8')
+
+def get_hash(value):
+	'''
+	Return the hash of a column value, the same in every process
+	'''
+	return zlib.crc32(get_value_key(value))
+
+def get_hash_index_path(file, table_name, column):
+	'''
+	Return the path to the sidecar file of the hash index on a column:
+	<database>-hash-<table>-<column>
+	'''
+	name = re.sub(r'[^A-Za-z0-9_]', '_', table_name + "-" + str(column))
+	return file.path + "-hash-" + name
+
+def iter_record_pages(file, page, unchanged=None):
+	'''
+	Generate (page, page type, contents) of every page holding records of the b-tree rooted at
+	page, in key order for table b-trees: the leaves of a table b-tree, and every page of an
+	index b-tree (tables created WITHOUT ROWID), whose interior cells also hold records.
+	unchanged maps the leaves known to be unchanged to their page type: they are generated
+	with None as their contents, without being read.
+	'''
+	if unchanged is not None and page in unchanged:
+		yield page, unchanged[page], None
+		return
+	pg_type = get_b_tree_type(file, page)
+	count_page(file, pg_type, page)
+	data = file.get_page(page)
+	try:
+		if (pg_type == TABLE_LEAF or pg_type == INDEX_LEAF or pg_type == INDEX_INTERIOR):
+			yield page, pg_type, data
+		if (pg_type == TABLE_INTERIOR or pg_type == INDEX_INTERIOR):
+			offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
+			for ptr in range(0, get_num_cells(file, page) * 2, 2):
+				yield from iter_record_pages(file, get_left_children(data, get_cell_offset(data, offset_to_ptr_arr, ptr)), unchanged)
+			yield from iter_record_pages(file, get_right_children(file, page), unchanged)
+	finally:
+		leave_page(file, page)
+
+def get_page_checksum(file, data, page, pg_type):
+	'''
+	Return the CRC-32 of a page holding records and of the overflow pages of its cells (which
+	can be rewritten without changing the cells themselves), and the list of those overflow pages
+	'''
+	checksum = zlib.crc32(data)
+	overflow_pages = []
+	offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
+	for ptr in range(0, get_num_cells(file, page) * 2, 2):
+		cell_offset = get_cell_offset(data, offset_to_ptr_arr, ptr)
+		if (pg_type == INDEX_INTERIOR):
+			cell_offset += 4
+		payload_size, payload_offset = read_varint(data, cell_offset)
+		if (pg_type == TABLE_LEAF):
+			_, payload_offset = read_varint(data, payload_offset)
+		local_size = get_local_payload_size(file, payload_size, pg_type)
+		if (local_size < payload_size):
+			overflow = read_int(data, payload_offset + local_size, 4)
+			while overflow != 0:
+				overflow_pages.append(overflow)
+				overflow_data = file.get_page(overflow)
+				checksum = zlib.crc32(overflow_data, checksum)
+				overflow = read_int(overflow_data, 0, 4)
+	return checksum, overflow_pages
+
+def get_changed_pages(file, key):
+	'''
+	Return the pages that may have changed since the database was in the state key (see
+	pagemap.get_key), or None if they are unknown. They are only known when the database is in
+	WAL mode and its WAL was only appended to since: they are then the pages with a frame
+	committed after the end of the WAL in key.
+	'''
+	wal = file.wal
+	if wal is None or wal.header is None or key[2] != file.page_size:
+		return None
+	if key[3:5] != tuple(wal.header[4:6]) or key[5] > wal.end:
+		return None
+	return set(page for page, offset in wal.frames.items() if offset > key[5])
+
+def is_hash_index(path):
+	'''
+	Return True if path is a sidecar file written by this version of build_hash_index
+	'''
+	try:
+		with open(path, 'rb') as sidecar:
+			return sidecar.read(len(HASH_INDEX_MAGIC)) == HASH_INDEX_MAGIC
+	except OSError:
+		return False
+
+class HashIndex:
+	'''
+	Hash index on one column of a table, kept in a sidecar file next to the database. Every
+	record is an entry holding the hash of its column, the page and cell it is stored in, and
+	its rowid (0 for tables created WITHOUT ROWID). Entries are grouped by bucket, so a lookup
+	reads the entries of one bucket from the memory-mapped file and then only the pages holding
+	records with the same hash.
+	'''
+
+	def __init__(self, path, table):
+		'''
+		Map the sidecar file of a hash index
+		INPUT: path: path to the sidecar file
+			table: cursor.Table of the indexed table
+		'''
+		self.path = path
+		self.table = table
+		with open(path, 'rb') as sidecar:
+			self.map = mmap.mmap(sidecar.fileno(), 0, access=mmap.ACCESS_READ)
+		view = memoryview(self.map)
+		magic, *fields = HASH_INDEX_HEADER.unpack_from(view)
+		if magic != HASH_INDEX_MAGIC:
+			view.release()
+			self.map.close()
+			exit("File " + path + " is not a hash index. Exiting.")
+		self.key = tuple(fields[:6])
+		self.root, self.position, num_pages, num_overflow, self.num_buckets, self.num_entries = fields[6:]
+
+		# Arrays of the file, as memoryviews of the mapping
+		self.views = [view]
+		offset = HASH_INDEX_HEADER.size
+		def take(typecode, count):
+			nonlocal offset
+			size = struct.calcsize(typecode) * count
+			# Rowids are 8-byte aligned
+			offset += -offset % struct.calcsize(typecode)
+			array_view = view[offset:offset + size].cast(typecode)
+			self.views.append(array_view)
+			offset += size
+			return array_view
+		self.pages = take('I', num_pages)
+		self.checksums = take('I', num_pages)
+		self.overflow_pages = take('I', num_overflow)
+		self.overflow_owners = take('I', num_overflow)
+		self.buckets = take('I', self.num_buckets + 1)
+		self.hashes = take('I', self.num_entries)
+		self.entry_pages = take('I', self.num_entries)
+		self.cells = take('I', self.num_entries)
+		self.page_types = take('B', num_pages)
+		self.rowids = take('q', self.num_entries)
+
+	def find(self, value):
+		'''
+		Return (page, cell, rowid) of every entry with the hash of value, without reading the
+		database. Entries with the same hash but another value are only told apart by lookup.
+		'''
+		value_hash = get_hash(value)
+		bucket = value_hash & (self.num_buckets - 1)
+		return [(self.entry_pages[i], self.cells[i], self.rowids[i])
+			for i in range(self.buckets[bucket], self.buckets[bucket + 1]) if self.hashes[i] == value_hash]
+
+	def lookup(self, value):
+		'''
+		Return the records whose column equals value (compared by their text form), reading
+		only the pages of the entries with the same hash
+		'''
+		file = self.table.file
+		key = get_value_key(value)
+		records = []
+		for page, cell, row_id in self.find(value):
+			pg_type = get_b_tree_type(file, page)
+			count_page(file, pg_type, page)
+			data = file.get_page(page)
+			cell_offset = get_cell_offset(data, offset_to_cell_ptr_arr(file, page), cell * 2)
+			record = get_cell_record(file, data, cell_offset, pg_type)
+			if not self.table.entry.without_rowid:
+				record = self.table.with_rowid(row_id, record)
+			if get_value_key(record[self.position]) == key:
+				match_row(file)
+				records.append(record)
+			leave_page(file, page)
+		return records
+
+	def close(self):
+		for view in reversed(self.views):
+			view.release()
+		self.map.close()
+
+def build_hash_index(table, position, path, key, old=None):
+	'''
+	Write the hash index on the column at position of a table to path, updating the old index
+	(if any) rather than decoding every page again:
+	* if the pages changed since the old index are known (see get_changed_pages), only the
+	  interior pages of the table and the pages holding records that changed (themselves or
+	  one of their overflow pages) are read
+	* otherwise every page holding records is read, and those whose checksum (see
+	  get_page_checksum) differs from the one in the old index are decoded
+	The entries of the other pages are copied from the old index.
+	OUTPUT: number of pages whose cells were decoded
+	'''
+	file = table.file
+	if old is not None and (old.root != table.entry.rootpage or old.position != position):
+		old = None
+	# Checksum, type and overflow pages of every page of the old index, and its entries by page
+	old_pages = {}
+	old_entries = {}
+	unchanged = None
+	if old is not None:
+		old_overflow = {}
+		for overflow, owner in zip(old.overflow_pages, old.overflow_owners):
+			old_overflow.setdefault(owner, []).append(overflow)
+		for page, checksum, pg_type in zip(old.pages, old.checksums, old.page_types):
+			old_pages[page] = (checksum, format(pg_type, '02x'), old_overflow.get(page, []))
+		for i in range(old.num_entries):
+			old_entries.setdefault(old.entry_pages[i], []).append((old.hashes[i], old.entry_pages[i], old.cells[i], old.rowids[i]))
+		changed = get_changed_pages(file, old.key)
+		if changed is not None:
+			# A page is unchanged if neither it nor its overflow pages have a new frame. Interior
+			# pages are always read, since a leaf can be replaced without them changing.
+			unchanged = {}
+			for page, (_, pg_type, overflow_pages) in old_pages.items():
+				if (pg_type == TABLE_LEAF or pg_type == INDEX_LEAF) and page not in changed and changed.isdisjoint(overflow_pages):
+					unchanged[page] = pg_type
+
+	pages = array('I')
+	checksums = array('I')
+	page_types = array('B')
+	overflow_pages = array('I')
+	overflow_owners = array('I')
+	entries = []
+	decoded = 0
+	for page, pg_type, data in iter_record_pages(file, table.entry.rootpage, unchanged):
+		if data is None:
+			checksum, _, page_overflow = old_pages[page]
+		else:
+			checksum, page_overflow = get_page_checksum(file, data, page, pg_type)
+		pages.append(page)
+		checksums.append(checksum)
+		page_types.append(int(pg_type, 16))
+		overflow_pages.extend(page_overflow)
+		overflow_owners.extend([page] * len(page_overflow))
+		if data is None or (page in old_pages and old_pages[page][:2] == (checksum, pg_type)):
+			entries.extend(old_entries.get(page, []))
+			continue
+		decoded += 1
+		offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
+		for cell in range(get_num_cells(file, page)):
+			cell_offset = get_cell_offset(data, offset_to_ptr_arr, cell * 2)
+			record = get_cell_record(file, data, cell_offset, pg_type)
+			row_id = 0
+			if (pg_type == TABLE_LEAF):
+				row_id = get_cell_rowid(data, cell_offset, pg_type)
+				record = table.with_rowid(row_id, record)
+			entries.append((get_hash(record[position]), page, cell, row_id))
+
+	# Power of 2 number of buckets, at least one per entry
+	num_buckets = 1
+	while num_buckets < len(entries):
+		num_buckets *= 2
+	buckets = array('I', bytes(4 * (num_buckets + 1)))
+	for entry in entries:
+		buckets[(entry[0] & (num_buckets - 1)) + 1] += 1
+	for bucket in range(num_buckets):
+		buckets[bucket + 1] += buckets[bucket]
+	# Entries are placed in their bucket in key order
+	hashes = array('I', bytes(4 * len(entries)))
+	entry_pages = array('I', bytes(4 * len(entries)))
+	cells = array('I', bytes(4 * len(entries)))
+	rowids = array('q', bytes(8 * len(entries)))
+	next_slot = array('I', buckets[:num_buckets])
+	for value_hash, page, cell, row_id in entries:
+		bucket = value_hash & (num_buckets - 1)
+		slot = next_slot[bucket]
+		next_slot[bucket] += 1
+		hashes[slot] = value_hash
+		entry_pages[slot] = page
+		cells[slot] = cell
+		rowids[slot] = row_id
+
+	temp_path = path + ".tmp"
+	with open(temp_path, 'wb') as out:
+		out.write(HASH_INDEX_HEADER.pack(HASH_INDEX_MAGIC, *key, table.entry.rootpage, position, len(pages),
+			len(overflow_pages), num_buckets, len(entries)))
+		for values in (pages, checksums, overflow_pages, overflow_owners, buckets, hashes, entry_pages, cells, page_types):
+			out.write(values.tobytes())
+		# Rowids are 8-byte aligned
+		out.write(bytes(-out.tell() % 8))
+		out.write(rowids.tobytes())
+	# The old index may still be mapped: replacing the file leaves the mapping valid
+	os.replace(temp_path, path)
+	return decoded
+
+def get_hash_index(file, table_name, column):
+	'''
+	Return the hash index on a column (name or position) of a table, kept with the Pager. It is
+	mapped from its sidecar file next to the database (see get_hash_index_path) if it was built
+	for the current state of the database. Otherwise it is built, or updated if the sidecar file
+	exists (see build_hash_index).
+	'''
+	if file.path is None:
+		exit("Hash indexes are kept next to the database file, which has no path. Exiting.")
+	file.refresh()
+	key = get_key(file)
+	index = file.hash_indexes.get((table_name, column))
+	if index is not None and index.key == key:
+		return index
+
+	table = Table(file, table_name)
+	position = table.column_position(column)
+	path = get_hash_index_path(file, table_name, column)
+	if index is None and is_hash_index(path):
+		index = HashIndex(path, table)
+	if index is None or index.key != key or index.root != table.entry.rootpage or index.position != position:
+		build_hash_index(table, position, path, key, index)
+		if index is not None:
+			index.close()
+		index = HashIndex(path, table)
+	file.hash_indexes[(table_name, column)] = index
+	return index
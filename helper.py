@@ -1,13 +1,25 @@
-import binascii 
-import counter
-
-HEADER_SIZE = 100
+import struct
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from pager import HEADER_SIZE
+from predicate import Predicate, EQUAL, RANGE
 
 # bytes of the b-tree page type
 TABLE_INTERIOR = "05"
 TABLE_LEAF = "0d"
 INDEX_INTERIOR = "02"
 INDEX_LEAF = "0a"
+# Overflow pages have no b-tree page type byte
+OVERFLOW = "overflow"
+
+# Name of each page type in the page counters (stats.PAGE_TYPES)
+PAGE_TYPE_NAME = {
+	TABLE_INTERIOR: "table_interior",
+	TABLE_LEAF: "table_leaf",
+	INDEX_INTERIOR: "index_interior",
+	INDEX_LEAF: "index_leaf",
+	OVERFLOW: "overflow"
+}
 
 # Order of the columns specified in the CSV
 COLUMN_NAME = {
@@ -25,11 +37,8 @@ INDEX_NAME = {
 	'Row_ID': 1
 }
 
-def hex_to_dec(hex):
-	'''
-	Return the decimal form of a hex
-	'''
-	return int(hex, 16)
+# Size of the content of serial types 0-11 (10 and 11 are reserved and never used)
+SERIAL_TYPE_SIZE = (0, 1, 2, 3, 4, 6, 8, 8, 0, 0, 0, 0)
 
 def bin_to_dec(bin):
 	'''
@@ -37,38 +46,52 @@ def bin_to_dec(bin):
 	'''
 	return int(bin, 2)
 
-def read_from_hex_offset(file, hex_offset, length):
-    '''
-    Fetch length bytes from file starting from the hexadecimal offset hex_offset
-    '''
-    offset = int(hex_offset, base=10)
-    file.seek(offset)
-    return file.read(length).hex()
+def read_int(data, offset, length):
+	'''
+	Return the big-endian unsigned integer stored in length bytes of a page starting at offset
+	'''
+	return int.from_bytes(data[offset:offset + length], 'big')
+
+def read_text(data, offset, length, encoding='utf-8'):
+	'''
+	Return the string stored in length bytes of a page starting at offset
+	'''
+	return str(data[offset:offset + length], encoding)
 
 def get_page_size(file):
 	'''
-    Get number of bytes per page (in decimal)
-    '''
-	return hex_to_dec(read_from_hex_offset(file, "16", 2))
+	Get number of bytes per page (in decimal)
+	'''
+	return file.page_size
+
+def get_page_hdr_offset(page):
+	'''
+	Return the offset of the b-tree header within a page. The first page holds the
+	database header before its b-tree header.
+	'''
+	if (page <= 1):
+		return HEADER_SIZE
+	return 0
 
 def get_b_tree_type(file, page):
 	'''
 	Given a page, return whether it is 0x05(table interior)/0x0d(table leaf)/
 	0x02(index interior)/0x0a(index leaf).
 	'''
-	if (page == 0):
-		# Root page: type of page is at offset 100
-		return str(read_from_hex_offset(file, str(HEADER_SIZE), 1))
-	else: 
-		# if not root page, type of b-tree is the first byte of the page
-		return str(read_from_hex_offset(file, str(get_page_size(file) * (page-1)), 1))
+	# Page map of the file (see pagemap.py), if one was loaded, saves reading the page
+	if file.page_map is not None:
+		pg_type = file.page_map.get_b_tree_type(page)
+		if pg_type is not None:
+			return pg_type
+	# type of b-tree is the first byte of the b-tree header
+	return format(file.get_page(page)[get_page_hdr_offset(page)], '02x')
 
 def get_num_pages(file):
 	'''
 	Return number of pages in a db in decimal.
 	'''
 	# Information always located at byte 28 of the first page
-	return hex_to_dec(read_from_hex_offset(file, "28", 4))
+	return read_int(file.get_page(0), 28, 4)
 
 def get_b_tree_hdr_size(page_type):
 	'''
@@ -84,35 +107,33 @@ def get_num_cells(file, page):
 	'''
 	Return the number of cells in decimal on any given page in the db file.
 	'''
-	if page == 0:
-		# root page
-		return hex_to_dec(read_from_hex_offset(file, str(HEADER_SIZE+3), 2))
-	else:
-		return hex_to_dec(read_from_hex_offset(file, str((get_page_size(file) * (page-1)) + 3), 2))
+	return read_int(file.get_page(page), get_page_hdr_offset(page) + 3, 2)
 
 def offset_to_cell_ptr_arr(file, page):
 	'''
-	Return the offset to the start of the cell pointer array given a page.
+	Return the offset (relative to the start of the page) to the start of the cell
+	pointer array given a page.
 	'''
-	if page == 0:
-		# root page always table leaf page
-		return HEADER_SIZE + 8
-	else:
-		pg_type = get_b_tree_type(file, page)
-		return (get_page_size(file) * (page-1)) + get_b_tree_hdr_size(pg_type)
+	pg_type = get_b_tree_type(file, page)
+	return get_page_hdr_offset(page) + get_b_tree_hdr_size(pg_type)
 
 def offset_to_cell_content(file, page):
 	'''
-	Return the offset to the start of the cell content given a page.
+	Return the offset (relative to the start of the page) to the start of the cell
+	content given a page.
 	'''
-	if page == 0:
-		return hex_to_dec(read_from_hex_offset(file, str(HEADER_SIZE + 5), 2))
-	else:
-		return str(int(hex_to_dec(read_from_hex_offset(file, str((get_page_size(file) * (page-1)) + 5), 2))) + (page-1)*get_page_size(file))
+	return read_int(file.get_page(page), get_page_hdr_offset(page) + 5, 2)
+
+def get_cell_offset(data, offset_to_ptr_arr, ptr):
+	'''
+	Return the offset of a cell within the page given the byte position ptr in the cell
+	pointer array.
+	'''
+	return read_int(data, offset_to_ptr_arr + ptr, 2)
 
-def get_varint(file, starting_offset):
+def get_varint(data, starting_offset):
 	'''
-	Given some offset where the varint starts, return the binary form.
+	Given a page and some offset where the varint starts, return the binary form.
 	In the form (varint in binary, ending offset in decimal)
 	'''
 	# Keep track of most_significant bit since we have to keep reading if the bit is 1
@@ -124,7 +145,7 @@ def get_varint(file, starting_offset):
 	num_bytes = 1
 
 	while (most_significant == 1) and num_bytes < 10:
-		hex_to_bin = format(hex_to_dec(read_from_hex_offset(file, str(offset), 1)), '08b')
+		hex_to_bin = format(data[offset], '08b')
 		most_significant = int(hex_to_bin[0])
 		if num_bytes < 9:
 			varint += hex_to_bin[1:]
@@ -139,22 +160,6 @@ def get_varint(file, starting_offset):
 	varint = str("0" * missing) + varint
 	return varint, offset
 
-
-def decode_varint(varint):
-	'''
-	Given a varint in binary, return the twos complements in decimal.
-	'''
-	new_bin = ""
-	for bit in range(0, len(varint), 8):
-		# Drop every 8th bit except for the 9th byte (if it exists)
-		if (bit != 64): #64 is the position of the most sig bit for the 9th byte
-			# drop most significant bit
-			new_bin += varint[bit+1:bit+8]
-		else:
-			# Keep most significant bit!
-			new_bin += varint[bit:bit+8]
-	return new_bin
-
 def get_serial_code_size(varint):
 	'''
 	Given a varint, return the size of the serial code (as specified in section 2.1 of the sqlite
@@ -180,79 +185,422 @@ def get_serial_code_size(varint):
 	else:
 		exit("Invalid serial code. Exiting.")
 
+def read_varint(data, offset):
+	'''
+	Given a page and some offset where the varint starts, decode it directly from the bytes.
+	In the form (varint in decimal, ending offset in decimal)
+	'''
+	byte = data[offset]
+	if (byte < 0x80):
+		# Most varints (serial types, small sizes and rowids) fit in one byte
+		return byte, offset + 1
+
+	value = byte & 0x7f
+	for i in range(1, 8):
+		byte = data[offset + i]
+		value = (value << 7) | (byte & 0x7f)
+		if (byte < 0x80):
+			return value, offset + i + 1
+	# All 8 bits of the 9th byte are used
+	return (value << 8) | data[offset + 8], offset + 9
+
+def get_serial_type_size(serial):
+	'''
+	Given a serial type in decimal, return the size of its content (as specified in section 2.1
+	of the sqlite file format page)
+	'''
+	if (serial >= 12):
+		return (serial - 12) // 2
+	return SERIAL_TYPE_SIZE[serial]
+
+def read_record_header(data, payload_offset):
+	'''
+	Decode the whole header of the record starting at payload_offset in one pass.
+	In the form (list of serial types, list of offsets to the content of each column)
+	'''
+	hdr_len, hdr_offset = read_varint(data, payload_offset)
+	hdr_end = payload_offset + hdr_len
+
+	serial_types = []
+	body_offsets = []
+	# Column contents start right after the header
+	body_offset = hdr_end
+	while hdr_offset < hdr_end:
+		serial = data[hdr_offset]
+		if (serial < 0x80):
+			hdr_offset += 1
+		else:
+			serial, hdr_offset = read_varint(data, hdr_offset)
+		serial_types.append(serial)
+		body_offsets.append(body_offset)
+		if (serial >= 12):
+			body_offset += (serial - 12) // 2
+		else:
+			body_offset += SERIAL_TYPE_SIZE[serial]
+	return serial_types, body_offsets
+
+def locate_column(data, payload_offset, position):
+	'''
+	Read the header of the record starting at payload_offset only up to the column at
+	position, and return (serial type of the column, offset to its content), or None if the
+	record has fewer columns
+	'''
+	hdr_len, hdr_offset = read_varint(data, payload_offset)
+	hdr_end = payload_offset + hdr_len
+	body_offset = hdr_end
+	for _ in range(position + 1):
+		if (hdr_offset >= hdr_end):
+			return None
+		serial = data[hdr_offset]
+		if (serial < 0x80):
+			hdr_offset += 1
+		else:
+			serial, hdr_offset = read_varint(data, hdr_offset)
+		offset = body_offset
+		if (serial >= 12):
+			body_offset += (serial - 12) // 2
+		else:
+			body_offset += SERIAL_TYPE_SIZE[serial]
+	return serial, offset
+
 def get_root_page(file, page):
 	'''
 	Get the root page number(s) (in decimal) from the first page of the file
 	'''
-	counter.header += 1
-	counter.table_leaf += 1
+	file.stats.add('header_reads')
+	count_page(file, TABLE_LEAF, page)
 
 	# keep track of root pages in a list since there maybe more than one (depending if the database is 
 	# indexed or not)
 	root_pages = []
 
+	data = file.get_page(page)
 	num_cells = get_num_cells(file, page)
 	offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
-	offset_to_content = offset_to_cell_content(file, page)
 
 	for cell in range(0, num_cells * 2, 2):
-		cell_offset = int(hex_to_dec(read_from_hex_offset(file, str(offset_to_ptr_arr + cell), 2))) + get_page_size(file) * (page)
-
-		# Get payload size from cell
-		payload_varint, payload_offset = get_varint(file, cell_offset)
-		payload_size = bin_to_dec(decode_varint(payload_varint))
-
-		# Get rowID
-		row_id, row_id_offset = get_varint(file, payload_offset)
-		row_id = bin_to_dec(row_id)
-
-		# Start parsing through intial portion of payload
-		hdr_len_varint, hdr_len_offset = get_varint(file, row_id_offset) # number of bytes to find out the length of the payload header (varint)
-		payload_hdr_len = hex_to_dec(read_from_hex_offset(file, str(row_id_offset), len(hdr_len_varint) // 8))
-
-		hdr_offset = row_id_offset + len(hdr_len_varint) // 8
-
-		# Since the root page number is located at the fourth serial code offset,
-		# keep track of the previous 3 serial code offsets to find root page
-		root_pg_offset = 0
-		byte = 0
-		while byte < payload_hdr_len - 1:
-			varint, _ = get_varint(file, hdr_offset + byte)
-			# root page is specified at the 4th serial code (ie at offset 3 starting from
-			# the header content offset)
-			if (byte == 3):
-				# Number of bytes to read 
-				root_byte_len = get_serial_code_size(varint)
-
-			elif (byte < 3): 
-				# Keep track of offsets of columns before rootpage column 
-				root_pg_offset += get_serial_code_size(varint)
-
-			if (len(varint) > 8):
-				# varint spans more than 1 byte, increment iterator to keep track
-				# of the right offset
-				byte += 1
-			byte += 1
-
-		record_body_offset = hdr_offset + byte
-		root_page = read_from_hex_offset(file, str(record_body_offset + root_pg_offset), root_byte_len)
-		root_pages.append(hex_to_dec(root_page))
+		cell_offset = get_cell_offset(data, offset_to_ptr_arr, cell)
+
+		# Root page is the 4th column of the sqlite_master records
+		# (type, name, tbl_name, rootpage, sql)
+		root_pages.append(get_cell_record(file, data, cell_offset, TABLE_LEAF)[3])
 
+	leave_page(file, page)
 	return root_pages
 
-def get_left_children(file, offset):
+def get_left_children(data, offset):
 	'''
-	Return page number of left children pointers given an offset
+	Return page number of left children pointers given an offset within a page
 	'''
 	# read 4-bytes to get page number of left child
-	return hex_to_dec(read_from_hex_offset(file, str(offset), 4))
+	return read_int(data, offset, 4)
 
 def get_right_children(file, page):
 	'''
 	Return page number of left children pointers given an interior page
 	'''
 	# right child is the 4 bytes at offset 8 bytes in the b-tree header
-	return hex_to_dec(read_from_hex_offset(file, str(get_page_size(file) * (page-1) + 8), 4))
+	return read_int(file.get_page(page), get_page_hdr_offset(page) + 8, 4)
+
+def count_page(file, pg_type, page):
+	'''
+	Count a read of page, of type pg_type, in the stats of file, and enter it in the tracer of
+	file (if any) until leave_page is called
+	'''
+	if page == 0:
+		# Page 0 is the first page, read with its file header
+		page = 1
+	file.stats.visit_page(PAGE_TYPE_NAME.get(pg_type), page)
+	if file.tracer is not None:
+		file.tracer.page_enter(page, PAGE_TYPE_NAME.get(pg_type))
+
+def leave_page(file, page):
+	'''
+	Exit page (and the pages entered after it) in the tracer of file (if any)
+	'''
+	if file.tracer is not None:
+		file.tracer.page_exit(page or 1)
+
+def match_row(file):
+	'''
+	Count a row matching the query in the stats and the tracer (if any) of file
+	'''
+	file.stats.add('rows_matched')
+	if file.tracer is not None:
+		file.tracer.row_match()
+
+def to_signed_rowid(value):
+	'''
+	Return the rowid stored as the unsigned varint value: rowids are 64-bit two's complement
+	integers, so negative rowids are stored as values of 2^63 or more
+	'''
+	if (value >= 1 << 63):
+		return value - (1 << 64)
+	return value
+
+def get_cell_rowid(data, cell_offset, pg_type):
+	'''
+	Return the integer key (rowid) of a table b-tree cell
+	'''
+	if (pg_type == TABLE_INTERIOR):
+		# Table interior cells are a 4-byte left child page number followed by the integer key
+		return to_signed_rowid(read_varint(data, cell_offset + 4)[0])
+	# Table leaf cells are the payload size followed by the rowid
+	_, row_id_offset = read_varint(data, cell_offset)
+	return to_signed_rowid(read_varint(data, row_id_offset)[0])
+
+def get_cell_payload_offset(data, cell_offset, pg_type):
+	'''
+	Return the offset to the start of the record (payload header) stored in a cell
+	'''
+	if (pg_type == TABLE_LEAF):
+		# Skip the payload size and the rowid
+		_, row_id_offset = read_varint(data, cell_offset)
+		_, payload_offset = read_varint(data, row_id_offset)
+	elif (pg_type == INDEX_INTERIOR):
+		# Skip the 4-byte left child page number and the payload size
+		_, payload_offset = read_varint(data, cell_offset + 4)
+	else:
+		# Skip the payload size
+		_, payload_offset = read_varint(data, cell_offset)
+	return payload_offset
+
+def decode_column(data, serial, offset, encoding='utf-8'):
+	'''
+	Return the value of a column of serial type serial whose content starts at offset, for
+	every serial type of the file format (section 2.1 of the sqlite file format page)
+	'''
+	if (serial == 0):
+		return None
+	elif (serial <= 6):
+		# Big-endian twos complement integers of 1, 2, 3, 4, 6 or 8 bytes
+		return int.from_bytes(data[offset:offset + SERIAL_TYPE_SIZE[serial]], 'big', signed=True)
+	elif (serial == 7):
+		# Big-endian IEEE 754 floating point number
+		return struct.unpack('>d', data[offset:offset + 8])[0]
+	elif (serial == 8 or serial == 9):
+		# Integer constants 0 and 1 take no space in the body
+		return serial - 8
+	elif (serial >= 12 and serial % 2 == 0):
+		return bytes(data[offset:offset + (serial - 12) // 2])
+	elif (serial >= 13):
+		# Text in the encoding of the database
+		return read_text(data, offset, (serial - 13) // 2, encoding)
+	else:
+		exit("Invalid serial code. Exiting.")
+
+def get_local_payload_size(file, payload_size, pg_type):
+	'''
+	Return how many bytes of a payload of payload_size bytes are stored in the cell itself,
+	as specified in the "B-tree Pages" section of the sqlite file format page. The rest of the
+	payload is stored on overflow pages.
+	'''
+	usable_size = file.usable_size
+	if (pg_type == TABLE_LEAF):
+		max_local = usable_size - 35
+	else:
+		max_local = ((usable_size - 12) * 64 // 255) - 23
+	if (payload_size <= max_local):
+		return payload_size
+
+	min_local = ((usable_size - 12) * 32 // 255) - 23
+	local = min_local + (payload_size - min_local) % (usable_size - 4)
+	if (local <= max_local):
+		return local
+	return min_local
+
+class Record:
+	'''
+	Record of a cell whose header is decoded up front, but whose columns are only decoded
+	when they are accessed (record[i], record[i:j] or by iterating over it). Decoded
+	columns are kept so that they are only decoded once. If the payload spills onto overflow
+	pages, they are only read when a column stored on them is accessed.
+	'''
+
+	def __init__(self, data, payload_offset, encoding='utf-8', file=None, local_size=None, overflow_page=0):
+		'''
+		INPUT: data: page holding the record
+			payload_offset: offset to the start of the record (payload header) in data
+			encoding: text encoding of the database
+			file: Pager over the database file, to read the overflow pages
+			local_size: number of bytes of the payload stored in the cell (None if the
+				whole payload is in the cell)
+			overflow_page: first overflow page of the payload (0 if there is none)
+		'''
+		self.data = data
+		self.payload_offset = payload_offset
+		self.encoding = encoding
+		self.file = file
+		self.local_size = local_size
+		self.overflow_page = overflow_page
+		# Overflow pages of the payload found so far, in order
+		self.overflow_pages = []
+		self.values = {}
+
+		if (overflow_page == 0):
+			self.serial_types, self.body_offsets = read_record_header(data, payload_offset)
+			return
+
+		hdr_len, _ = read_varint(data, payload_offset)
+		if (hdr_len <= local_size):
+			self.serial_types, self.body_offsets = read_record_header(data, payload_offset)
+		else:
+			# The header itself continues on the overflow pages
+			self.serial_types, body_offsets = read_record_header(self.read_payload(0, hdr_len), 0)
+			self.body_offsets = [payload_offset + offset for offset in body_offsets]
+
+	def __len__(self):
+		return len(self.serial_types)
+
+	def __getitem__(self, column):
+		if isinstance(column, slice):
+			return [self[i] for i in range(*column.indices(len(self)))]
+		if (column < 0):
+			column += len(self)
+		if column not in self.values:
+			serial = self.serial_types[column]
+			offset = self.body_offsets[column]
+			size = get_serial_type_size(serial)
+			if (self.overflow_page == 0 or offset + size <= self.payload_offset + self.local_size):
+				self.values[column] = decode_column(self.data, serial, offset, self.encoding)
+			else:
+				# Column is (at least partly) stored on overflow pages
+				content = self.read_payload(offset - self.payload_offset, size)
+				self.values[column] = decode_column(content, serial, 0, self.encoding)
+		return self.values[column]
+
+	def __iter__(self):
+		for column in range(len(self)):
+			yield self[column]
+
+	def match(self, column, predicate):
+		'''
+		Return True if the column satisfies predicate (predicate.Predicate). The encoded
+		bytes of the column are checked first, so that the column is only decoded if
+		they are not enough to tell.
+		'''
+		if (column >= len(self)):
+			# Columns added after the record was written are NULL
+			return predicate.matches_value(None)
+		serial = self.serial_types[column]
+		offset = self.body_offsets[column]
+		if column not in self.values and (self.overflow_page == 0 or
+			offset + get_serial_type_size(serial) <= self.payload_offset + self.local_size):
+			result = predicate.matches(self.data, serial, offset)
+			if result is not None:
+				return result
+		return predicate.matches_value(self[column])
+
+	def __repr__(self):
+		return "Record(" + repr(list(self)) + ")"
+
+	def get_overflow_page(self, index):
+		'''
+		Return the contents of the index-th overflow page of the payload, following the chain
+		of overflow pages as far as needed
+		'''
+		while len(self.overflow_pages) <= index:
+			if not self.overflow_pages:
+				page = self.overflow_page
+			else:
+				# The first 4 bytes of an overflow page are the number of the next one
+				page = read_int(self.file.get_page(self.overflow_pages[-1]), 0, 4)
+			count_page(self.file, OVERFLOW, page)
+			leave_page(self.file, page)
+			self.overflow_pages.append(page)
+		return self.file.get_page(self.overflow_pages[index])
+
+	def read_payload(self, start, length):
+		'''
+		Return length bytes of the payload starting at start (relative to the start of the
+		payload), reading the overflow pages for the bytes that are not stored in the cell
+		'''
+		content = b""
+		if (start < self.local_size):
+			end = min(start + length, self.local_size)
+			content += bytes(self.data[self.payload_offset + start:self.payload_offset + end])
+			length -= end - start
+			start = end
+
+		# Each overflow page holds usable_size - 4 bytes of the payload after its next page number
+		overflow_size = self.file.usable_size - 4
+		while length > 0:
+			offset = (start - self.local_size) % overflow_size
+			size = min(length, overflow_size - offset)
+			data = self.get_overflow_page((start - self.local_size) // overflow_size)
+			content += bytes(data[4 + offset:4 + offset + size])
+			start += size
+			length -= size
+		return content
+
+def get_cell_record(file, data, cell_offset, pg_type):
+	'''
+	Return the record stored in the cell at cell_offset of a table leaf or index page,
+	including the part of its payload stored on overflow pages. Its columns are decoded when
+	accessed.
+	'''
+	if (pg_type == INDEX_INTERIOR):
+		# Skip the 4-byte left child page number
+		cell_offset += 4
+	payload_size, payload_offset = read_varint(data, cell_offset)
+	if (pg_type == TABLE_LEAF):
+		# Skip the rowid
+		_, payload_offset = read_varint(data, payload_offset)
+
+	file.stats.add('cells_decoded')
+	if file.tracer is not None:
+		file.tracer.cell_decode()
+	local_size = get_local_payload_size(file, payload_size, pg_type)
+	if (local_size == payload_size):
+		return Record(data, payload_offset, file.encoding)
+	# The page number of the first overflow page follows the part of the payload in the cell
+	overflow_page = read_int(data, payload_offset + local_size, 4)
+	return Record(data, payload_offset, file.encoding, file, local_size, overflow_page)
+
+def format_record(values):
+	'''
+	Return the column values of a record (or a list of values) in the same form as the
+	results of binary_search
+	'''
+	return "".join(str(value) + " " for value in values)
+
+def get_sort_key(values, encoding='utf-8'):
+	'''
+	Return a comparable form of a list of column values following the SQLite sort order
+	(NULL < numbers < text < blob). Text is compared with the BINARY collation, i.e. by the
+	bytes it is encoded to in the database (UTF-16 bytes do not sort like the text they encode).
+	'''
+	sort_key = []
+	for value in values:
+		if value is None:
+			sort_key.append((0, 0))
+		elif isinstance(value, (int, float)):
+			sort_key.append((1, value))
+		elif isinstance(value, str):
+			# UTF-8 bytes sort in the same order as the text they encode
+			sort_key.append((2, value if encoding == 'utf-8' else value.encode(encoding)))
+		else:
+			sort_key.append((3, value))
+	return sort_key
+
+def get_column_position(col, columns):
+	'''
+	Return the position of a column in a record, given either its name (looked up in the dict
+	columns) or its position (e.g. from catalog.column_index)
+	'''
+	if isinstance(col, int):
+		return col
+	return columns[col]
+
+@lru_cache(maxsize=64)
+def get_key_predicate(key, isRange, range_start, range_end, encoding):
+	'''
+	Return the predicate columns are matched against by binary_search, compiled only once
+	for all the pages of a search
+	'''
+	if isRange:
+		return Predicate(RANGE, range_start, range_end, encoding, as_text=True)
+	return Predicate(EQUAL, key, encoding=encoding, as_text=True)
 
 def binary_search(file, page, col, key, track, isWithoutRowID=False, 
 	isSearchByRowID=False, row_id_set=None,
@@ -262,9 +610,9 @@ def binary_search(file, page, col, key, track, isWithoutRowID=False,
 	the key
 
 	INPUT:
-		file: database file to be read
+		file: Pager over the database file to be read
 		page: starting page to recurse through its children pages (if it exists)
-		col: Name of column of database
+		col: Name of column of database, or its position in the records
 		key: what you want to search for in col
 		track: a set to keep track of results
 		isWithoutRowID: True if database created with the WITHOUT ROWID specification and want to 
@@ -276,11 +624,11 @@ def binary_search(file, page, col, key, track, isWithoutRowID=False,
 		range_start: Only use if isRange=True. Starting value of the range.
 		range_end: Only use if isRange=True. Ending value of the range. 
 	'''
-	counter.counter += 1
 	pg_type = get_b_tree_type(file, page)
+	count_page(file, pg_type, page)
+	data = file.get_page(page)
 
 	if (pg_type == TABLE_LEAF):
-		counter.table_leaf += 1
 		# Read stored records to see if anything matches the key
 		num_cells = get_num_cells(file, page)
 		offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
@@ -288,15 +636,12 @@ def binary_search(file, page, col, key, track, isWithoutRowID=False,
 
 		# read each cell content in leaf page
 		for ptr in range(0, num_cells * 2, 2):
-			cell_offset = int(hex_to_dec(read_from_hex_offset(file, str(offset_to_ptr_arr + ptr), 2))) + get_page_size(file) * (page - 1)
+			cell_offset = get_cell_offset(data, offset_to_ptr_arr, ptr)
 
-			# Get payload size information from the table leaf cell
-			payload_varint, payload_offset = get_varint(file, cell_offset)
-			payload_size = bin_to_dec(decode_varint(payload_varint))
-
-			# Get rowID
-			row_id, row_id_offset = get_varint(file, payload_offset)
-			row_id = bin_to_dec(row_id)
+			# Get rowID (after the payload size)
+			payload_size, payload_offset = read_varint(data, cell_offset)
+			row_id, row_id_offset = read_varint(data, payload_offset)
+			row_id = to_signed_rowid(row_id)
 
 			if (isSearchByRowID):
 				# Compare rowID to see if anything matches the rowIDs given in row_id_set.
@@ -304,73 +649,29 @@ def binary_search(file, page, col, key, track, isWithoutRowID=False,
 				if (row_id not in row_id_set):
 					continue
 
-			# number of bytes to find out the length of the payload header (varint)
-			hdr_len_varint, hdr_len_offset = get_varint(file, row_id_offset) 
-			# Number of bytes that the serial codes will take up
-			payload_hdr_len = hex_to_dec(read_from_hex_offset(file, str(row_id_offset), len(hdr_len_varint) // 8))
-
-			# offset to start of header (after header length)
-			hdr_offset = row_id_offset + len(hdr_len_varint) // 8
-
-			byte = 0
-			# serial location 
-			serial = COLUMN_NAME[col]
-			serial_offset = 0
-			# Keep track of current potential match's Emp_ID + Name
-			name = ""
-
-			# Read through payload contents
-			while byte < payload_hdr_len - 1:
-				varint, _ = get_varint(file, hdr_offset + byte)
-				# Keep track of how many bytes we need to read for each serial 
-				length = get_serial_code_size(varint)
-
-				if (byte == serial):
-					# Found desired serial in record
-
-					if (byte == 0):
-						# Keep track of current potential match's Emp_ID + Name
-						# if Emp_ID, stored as hex -> dec. Otherwise, store as hex -> ascii
-						potential_match = hex_to_dec(read_from_hex_offset(file, str(hdr_offset + (payload_hdr_len - 1) + serial_offset), length))
-						name += str(hex_to_dec(read_from_hex_offset(file, str((hdr_offset) + (payload_hdr_len - 1) + serial_offset), length))) + " "
-					else:
-						potential_match = str(binascii.unhexlify(read_from_hex_offset(file, str(hdr_offset + (payload_hdr_len - 1) + serial_offset), length)))[2:-1]
-				
-						field = str(binascii.unhexlify(read_from_hex_offset(file, str((hdr_offset) + (payload_hdr_len - 1) + serial_offset), length)))
-						name += field[2:-1] + " "
-				else:
-					if (byte == 0):
-						# Need to keep track of other contents in the payload that's part of the name
-						name += str(hex_to_dec(read_from_hex_offset(file, str((hdr_offset) + (payload_hdr_len - 1) + serial_offset), length))) + " "
-					else:
-						field = str(binascii.unhexlify(read_from_hex_offset(file, str((hdr_offset) + (payload_hdr_len - 1) + serial_offset), length)))
-						name += field[2:-1] + " "
-				if (len(varint) > 8):
-					# varint spans more than 1 byte, increment iterator to keep track
-					# of the right offset
-					byte += 1
-				byte += 1
-				# Update offset of the next serial to read in the cell
-				serial_offset += length
-
-			if not isRange:
-				if not isSearchByRowID:
-					if(str(potential_match) == key):
-						track.add(name)
-				else: 
-					# If reached this line, we have already found the matching record.
-					track.add(name)
+			if not isSearchByRowID:
+				# Match the searched column on its encoded bytes before decoding anything. The
+				# record is only decoded if it is a match.
+				predicate = get_key_predicate(key, isRange, range_start, range_end, file.encoding)
+				position = get_column_position(col, COLUMN_NAME)
+				result = None
+				if (payload_size <= file.usable_size - 35):
+					# Whole payload is in the cell, so the column is found from the header alone
+					column = locate_column(data, row_id_offset, position)
+					if column is not None:
+						result = predicate.matches(data, column[0], column[1])
+				if result is False:
+					continue
+				record = get_cell_record(file, data, cell_offset, pg_type)
+				if result or record.match(position, predicate):
+					track.add(format_record(record))
+					match_row(file)
 			else: 
-				if not isSearchByRowID:
-					if(int(str(potential_match)) >= int(range_start) and int(str(potential_match)) <= int(range_end)):			
-							track.add(name)
-				else: 
-					# If reached this line, we have already found the matching record.
-					track.add(name)
+				# If reached this line, we have already found the matching record.
+				track.add(format_record(get_cell_record(file, data, cell_offset, pg_type)))
+				match_row(file)
 		
 	elif (pg_type == TABLE_INTERIOR):
-		counter.table_interior += 1
-	
 		num_cells = get_num_cells(file, page)
 		offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
 
@@ -381,18 +682,15 @@ def binary_search(file, page, col, key, track, isWithoutRowID=False,
 		# Iterate through each cell pointer
 		for ptr in range(0, num_cells * 2, 2):
 			# Get the offset to the cell content
-			cell_offset = int(hex_to_dec(read_from_hex_offset(file, str(offset_to_ptr_arr + ptr), 2))) + get_page_size(file) * (page - 1)
+			cell_offset = get_cell_offset(data, offset_to_ptr_arr, ptr)
 			# Recursively search children in left pointer
-			left_child_pg = get_left_children(file, cell_offset)
+			left_child_pg = get_left_children(data, cell_offset)
 
 			# each table interior cell holds the page number of its left child 
 			binary_search(file, left_child_pg, col, key, track, isWithoutRowID,isSearchByRowID, row_id_set, isRange, range_start, range_end)
 
 	elif (pg_type == INDEX_INTERIOR or pg_type == INDEX_LEAF):
-		if (pg_type == INDEX_LEAF):
-			counter.index_leaf += 1
 		if (pg_type == INDEX_INTERIOR):
-			counter.index_interior += 1
 			# Each index interior page has one 4-byte page number for right child
 			right_child_pg = get_right_children(file, page)
 			binary_search(file, right_child_pg, col, key, track, isWithoutRowID, isSearchByRowID, row_id_set, isRange, range_start, range_end)
@@ -401,93 +699,326 @@ def binary_search(file, page, col, key, track, isWithoutRowID=False,
 		offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
 		offset_to_content = offset_to_cell_content(file, page)
 		for ptr in range(0, num_cells * 2, 2):
-			cell_offset = int(hex_to_dec(read_from_hex_offset(file, str(offset_to_ptr_arr + ptr), 2))) + get_page_size(file) * (page-1)
+			cell_offset = get_cell_offset(data, offset_to_ptr_arr, ptr)
 			if (pg_type == INDEX_INTERIOR):
 				# Each index interior cell has one 4-byte page number for left child
-				left_child_pg = get_left_children(file, cell_offset)
+				left_child_pg = get_left_children(data, cell_offset)
 				binary_search(file, left_child_pg, col, key, track, isWithoutRowID, isSearchByRowID, row_id_set, isRange, range_start, range_end)
 
-				# Add 4 bytes to cell_offset since 4 bytes are allocated to left pointer child pages
-				payload_varint, payload_offset = get_varint(file, cell_offset+4)
-			else:
-				# index leaf cells do not have children pages
-				payload_varint, payload_offset = get_varint(file, cell_offset)
-
-			payload_size = bin_to_dec(decode_varint(payload_varint))
-
 			# Index cells do not contain rowIDs/int keys, unlike table cells
-			hdr_len_varint, hdr_len_offset = get_varint(file, payload_offset)
-
-			payload_hdr_len = hex_to_dec(read_from_hex_offset(file, str(payload_offset), len(hdr_len_varint) // 8))
-
-			hdr_offset = payload_offset + len(hdr_len_varint) // 8
-
-			byte = 0
-			if (isWithoutRowID == False):
-				# payload in INDEX_INTERIOR cells are of format (Emp_ID, rowid)
-				serial = INDEX_NAME[col]
-			else: 
-				serial = COLUMN_NAME[col]
-			serial_offset = 0
-
-			# keep track of current potential match's Emp_ID + Name
-			name = ""
-
-			while byte < payload_hdr_len - 1:
-				varint, _ = get_varint(file, hdr_offset + byte)
-				length = get_serial_code_size(varint)
-
-				if (byte == serial):
-					if not isWithoutRowID:
-						# Keep track of current potential match (i.e. in this case it is Emp_ID)
-						potential_match = hex_to_dec(read_from_hex_offset(file, str(hdr_offset + (payload_hdr_len - 1) + serial_offset), length))
-					else: 
-						# Keep track of current potential match's Emp_ID + Name
-						if (byte == 0):
-							# if Emp_ID, stored as hex -> dec
-							potential_match = hex_to_dec(read_from_hex_offset(file, str(hdr_offset + (payload_hdr_len - 1) + serial_offset), length))
-							name += str(hex_to_dec(read_from_hex_offset(file, str((hdr_offset) + (payload_hdr_len - 1) + serial_offset), length))) + " "
-						
-						else:
-							#Else, stored as hex -> ascii
-							potential_match = str(binascii.unhexlify(read_from_hex_offset(file, str(hdr_offset + (payload_hdr_len - 1) + serial_offset), length)))[2:-1]
-					
-							field = str(binascii.unhexlify(read_from_hex_offset(file, str((hdr_offset) + (payload_hdr_len - 1) + serial_offset), length)))
-							name += field[2:-1] + " "
-				else:
-					if not isWithoutRowID:
-						if (length > 0): 
-							# Keep track of row_ID in case the Emp_ID matches our search
-							potential_row_id = hex_to_dec(read_from_hex_offset(file, str(hdr_offset + (payload_hdr_len - 1) + serial_offset), length))
-					else:
-						# Keep track of current potential match's Emp_ID + Name
-						if (byte == 0):
-							# if Emp_ID, stored as hex -> dec
-							name += str(hex_to_dec(read_from_hex_offset(file, str((hdr_offset) + (payload_hdr_len - 1) + serial_offset), length))) + " "
-						else:
-							# if not Emp_ID, stored as hex -> ascii
-							field = str(binascii.unhexlify(read_from_hex_offset(file, str((hdr_offset) + (payload_hdr_len - 1) + serial_offset), length)))
-							name += field[2:-1] + " "
-				if (len(varint) > 8):
-					# varint spans more than 1 byte, increment interator to keep track of the offset
-					byte += 1
-				byte += 1
-				# Update offset to read next serial
-				serial_offset += length
+			record = get_cell_record(file, data, cell_offset, pg_type)
+			if not isWithoutRowID:
+				# payload in index cells are of format (Emp_ID, rowid)
+				potential_match = record[get_column_position(col, INDEX_NAME)]
+			else:
+				potential_match = record[get_column_position(col, COLUMN_NAME)]
 
 			if not isRange:
 				if (str(potential_match) == key):
 					if not isWithoutRowID:
 						# keep the row_id as we will need to use it to find it in the table b-trees later
-						track.add(potential_row_id)
+						# (the row is counted as a match there)
+						track.add(record[INDEX_NAME['Row_ID']])
 
 					else:
-						track.add(name)
+						track.add(format_record(record))
+						match_row(file)
 			else: 
-				if(str(potential_match)>=range_start and str(potential_match)<=range_end):
+				if isinstance(potential_match, int):
+					# Compare integers by value rather than as strings
+					in_range = potential_match >= int(range_start) and potential_match <= int(range_end)
+				else:
+					in_range = potential_match >= range_start and potential_match <= range_end
+				if (in_range):
 					if not isWithoutRowID:
 						# keep the row_id as we will need to use it to find it in the table b-trees later
-						track.add(potential_row_id)
+						# (the row is counted as a match there)
+						track.add(record[INDEX_NAME['Row_ID']])
 
 					else:
-						track.add(name)
+						track.add(format_record(record))
+						match_row(file)
+
+	leave_page(file, page)
+
+def find_by_rowid(file, page, row_id):
+	'''
+	Descend the table b-tree rooted at page to the one leaf that can hold row_id, bisecting
+	the integer keys of each TABLE_INTERIOR page so that only one page is read per level.
+
+	INPUT:
+		file: Pager over the database file to be read
+		page: root page of a table b-tree
+		row_id: rowid to look up
+	OUTPUT: list of column values of the matching record, or None if there is no such row
+	'''
+	root = page
+	while True:
+		pg_type = get_b_tree_type(file, page)
+		if (pg_type != TABLE_INTERIOR and pg_type != TABLE_LEAF):
+			exit("Page " + str(page) + " is not a table b-tree page. Exiting.")
+		count_page(file, pg_type, page)
+
+		data = file.get_page(page)
+		num_cells = get_num_cells(file, page)
+		offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
+
+		# Cells are sorted by rowid, so find the first cell whose key is >= row_id
+		cell = bisect_left(range(num_cells), row_id,
+			key=lambda i: get_cell_rowid(data, get_cell_offset(data, offset_to_ptr_arr, i * 2), pg_type))
+
+		if (pg_type == TABLE_LEAF):
+			record = None
+			cell_offset = get_cell_offset(data, offset_to_ptr_arr, cell * 2) if cell < num_cells else None
+			if (cell_offset is not None and get_cell_rowid(data, cell_offset, pg_type) == row_id):
+				record = get_cell_record(file, data, cell_offset, pg_type)
+				match_row(file)
+			# Exit every page of the descent
+			leave_page(file, root)
+			return record
+
+		# All rowids in the left child of a cell are <= the key of that cell, and
+		# rowids larger than every key are in the right child
+		if (cell == num_cells):
+			page = get_right_children(file, page)
+		else:
+			page = get_left_children(data, get_cell_offset(data, offset_to_ptr_arr, cell * 2))
+
+def find_by_rowids(file, page, row_ids, results):
+	'''
+	Append the records of every rowid in row_ids found in the table b-tree rooted at page to
+	results, in rowid order. The rowids are sorted and routed down the tree together: each
+	interior page is read once for all the rowids under it, and only the leaves that can hold
+	one of the rowids are read.
+
+	INPUT:
+		file: Pager over the database file to be read
+		page: root page of a table b-tree (or of one of its subtrees)
+		row_ids: collection of rowids to look up
+		results: a list to keep track of results
+	'''
+	row_ids = sorted(row_ids)
+	if not row_ids:
+		return
+
+	pg_type = get_b_tree_type(file, page)
+	if (pg_type != TABLE_INTERIOR and pg_type != TABLE_LEAF):
+		exit("Page " + str(page) + " is not a table b-tree page. Exiting.")
+	count_page(file, pg_type, page)
+
+	data = file.get_page(page)
+	num_cells = get_num_cells(file, page)
+	offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
+
+	def get_rowid(i):
+		return get_cell_rowid(data, get_cell_offset(data, offset_to_ptr_arr, i * 2), pg_type)
+
+	if (pg_type == TABLE_LEAF):
+		cell = 0
+		for row_id in row_ids:
+			# rowids are sorted, so each search can start from the previous cell
+			cell = bisect_left(range(num_cells), row_id, lo=cell, key=get_rowid)
+			if (cell == num_cells):
+				break
+			if (get_rowid(cell) == row_id):
+				cell_offset = get_cell_offset(data, offset_to_ptr_arr, cell * 2)
+				results.append(get_cell_record(file, data, cell_offset, pg_type))
+				match_row(file)
+		leave_page(file, page)
+		return
+
+	# Group neighbouring rowids that belong to the same child and read each child once
+	start = 0
+	while start < len(row_ids):
+		cell = bisect_left(range(num_cells), row_ids[start], key=get_rowid)
+		if (cell == num_cells):
+			child_pg = get_right_children(file, page)
+			end = len(row_ids)
+		else:
+			child_pg = get_left_children(data, get_cell_offset(data, offset_to_ptr_arr, cell * 2))
+			# All rowids <= the key of the cell are in its left child
+			end = bisect_right(row_ids, get_rowid(cell), lo=start)
+		find_by_rowids(file, child_pg, row_ids[start:end], results)
+		start = end
+	leave_page(file, page)
+
+def find_by_key(file, page, key, count_rows=True):
+	'''
+	Descend the index b-tree rooted at page (an index, or a table created WITHOUT ROWID) to
+	the entry whose leading columns equal key, bisecting the keys of each INDEX_INTERIOR page
+	so that only one page is read per level. Since interior cells of index b-trees hold
+	entries themselves, the search stops as soon as any page holds the key. The key is
+	expected to be unique (e.g. a PRIMARY KEY); use a range search for duplicate keys.
+
+	INPUT:
+		file: Pager over the database file to be read
+		page: root page of an index b-tree
+		key: list of values of the leading columns of the index, e.g. [181162]
+		count_rows: False if the entry is only used to look its row up in the table, where the
+			row is counted as a match instead
+	OUTPUT: list of column values of the matching entry, or None if there is no such entry
+	'''
+	key = get_sort_key(key, file.encoding)
+	root = page
+	while True:
+		pg_type = get_b_tree_type(file, page)
+		if (pg_type != INDEX_INTERIOR and pg_type != INDEX_LEAF):
+			exit("Page " + str(page) + " is not an index b-tree page. Exiting.")
+		count_page(file, pg_type, page)
+
+		data = file.get_page(page)
+		num_cells = get_num_cells(file, page)
+		offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
+
+		def get_entry(i):
+			cell_offset = get_cell_offset(data, offset_to_ptr_arr, i * 2)
+			return get_cell_record(file, data, cell_offset, pg_type)
+
+		# Entries are sorted by their columns, so find the first entry >= key
+		cell = bisect_left(range(num_cells), key, key=lambda i: get_sort_key(get_entry(i)[:len(key)], file.encoding))
+
+		if (cell < num_cells):
+			entry = get_entry(cell)
+			if (get_sort_key(entry[:len(key)], file.encoding) == key):
+				if count_rows:
+					match_row(file)
+				# Exit every page of the descent
+				leave_page(file, root)
+				return entry
+
+		if (pg_type == INDEX_LEAF):
+			leave_page(file, root)
+			return None
+
+		# Entries in the left child of a cell are smaller than the entry of that cell, and
+		# entries larger than every cell are in the right child
+		if (cell == num_cells):
+			page = get_right_children(file, page)
+		else:
+			page = get_left_children(data, get_cell_offset(data, offset_to_ptr_arr, cell * 2))
+
+def iter_rowid_range(file, page, range_start=None, range_end=None):
+	'''
+	Generate (rowid, record) for the rows with range_start <= rowid <= range_end of the table
+	b-tree rooted at page, in rowid order. Interior keys are used to skip the children holding
+	only smaller rowids, and the generator stops at the first rowid greater than range_end.
+	Pages are only read when the generator reaches them, so a caller that stops early never
+	reads the rest of the tree.
+
+	INPUT:
+		file: Pager over the database file to be read
+		page: root page of a table b-tree (or of one of its subtrees)
+		range_start: smallest rowid to return (None for no lower bound)
+		range_end: largest rowid to return (None for no upper bound)
+	'''
+	pg_type = get_b_tree_type(file, page)
+	if (pg_type != TABLE_INTERIOR and pg_type != TABLE_LEAF):
+		exit("Page " + str(page) + " is not a table b-tree page. Exiting.")
+	count_page(file, pg_type, page)
+
+	data = file.get_page(page)
+	num_cells = get_num_cells(file, page)
+	offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
+
+	first_cell = 0
+	if range_start is not None:
+		# Cells before the first key >= range_start (and their left children) only hold smaller rowids
+		first_cell = bisect_left(range(num_cells), range_start,
+			key=lambda i: get_cell_rowid(data, get_cell_offset(data, offset_to_ptr_arr, i * 2), pg_type))
+
+	# The page is exited when the generator returns, or is closed by a caller that stopped early
+	try:
+		for cell in range(first_cell, num_cells):
+			cell_offset = get_cell_offset(data, offset_to_ptr_arr, cell * 2)
+			row_id = get_cell_rowid(data, cell_offset, pg_type)
+			if (pg_type == TABLE_INTERIOR):
+				yield from iter_rowid_range(file, get_left_children(data, cell_offset), range_start, range_end)
+				if range_end is not None and row_id >= range_end:
+					# Every rowid <= this key was in the left child
+					return
+			else:
+				if range_end is not None and row_id > range_end:
+					return
+				yield row_id, get_cell_record(file, data, cell_offset, pg_type)
+
+		if (pg_type == TABLE_INTERIOR):
+			yield from iter_rowid_range(file, get_right_children(file, page), range_start, range_end)
+	finally:
+		leave_page(file, page)
+
+def iter_key_range(file, page, range_start=None, range_end=None):
+	'''
+	Generate the entries of the index b-tree rooted at page (an index, or a table created
+	WITHOUT ROWID) whose leading columns are between range_start and range_end (inclusive), in
+	key order. The generator descends to the first entry >= range_start using the interior
+	keys and stops at the first entry greater than range_end. Values are compared following
+	the SQLite sort order (integers by value, text by its encoded bytes), so only indexes using
+	the BINARY collation are supported: the entries of an index declared with another collation
+	(e.g. NOCASE) are not in that order. Pages are only read when the generator reaches them, so
+	a caller that stops early never reads the rest of the tree.
+
+	INPUT:
+		file: Pager over the database file to be read
+		page: root page of an index b-tree (or of one of its subtrees)
+		range_start: list of values of the leading columns of the index, e.g. [171800]
+			(None for no lower bound)
+		range_end: list of values of the leading columns of the index, e.g. [171899]
+			(None for no upper bound)
+	'''
+	pg_type = get_b_tree_type(file, page)
+	if (pg_type != INDEX_INTERIOR and pg_type != INDEX_LEAF):
+		exit("Page " + str(page) + " is not an index b-tree page. Exiting.")
+	count_page(file, pg_type, page)
+
+	data = file.get_page(page)
+	num_cells = get_num_cells(file, page)
+	offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
+
+	def get_entry(i):
+		return get_cell_record(file, data, get_cell_offset(data, offset_to_ptr_arr, i * 2), pg_type)
+
+	first_cell = 0
+	if range_start is not None:
+		# Cells before the first entry >= range_start (and their left children) only hold smaller entries
+		start = get_sort_key(range_start, file.encoding)
+		first_cell = bisect_left(range(num_cells), start, key=lambda i: get_sort_key(get_entry(i)[:len(start)], file.encoding))
+	if range_end is not None:
+		end = get_sort_key(range_end, file.encoding)
+
+	# The page is exited when the generator returns, or is closed by a caller that stopped early
+	try:
+		for cell in range(first_cell, num_cells):
+			if (pg_type == INDEX_INTERIOR):
+				# Entries in the left child come before the entry of this cell
+				cell_offset = get_cell_offset(data, offset_to_ptr_arr, cell * 2)
+				yield from iter_key_range(file, get_left_children(data, cell_offset), range_start, range_end)
+			entry = get_entry(cell)
+			if range_end is not None and get_sort_key(entry[:len(end)], file.encoding) > end:
+				return
+			yield entry
+
+		if (pg_type == INDEX_INTERIOR):
+			yield from iter_key_range(file, get_right_children(file, page), range_start, range_end)
+	finally:
+		leave_page(file, page)
+
+def find_key_range(file, page, range_start, range_end, results, count_rows=True):
+	'''
+	Append the entries of the index b-tree rooted at page (an index, or a table created
+	WITHOUT ROWID) whose leading columns are between range_start and range_end (inclusive) to
+	results, in key order (see iter_key_range). The pages read scale with the number of
+	results rather than the size of the index.
+
+	INPUT:
+		file: Pager over the database file to be read
+		page: root page of an index b-tree
+		range_start: list of values of the leading columns of the index, e.g. [171800]
+		range_end: list of values of the leading columns of the index, e.g. [171899]
+		results: a list to keep track of results
+		count_rows: False if the entries are only used to look their rows up in the table, where
+			the rows are counted as matches instead
+	'''
+	for entry in iter_key_range(file, page, range_start, range_end):
+		results.append(entry)
+		if count_rows:
+			match_row(file)
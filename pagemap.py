@@ -0,0 +1,238 @@
+import os
+import struct
+from array import array
+from helper import *
+from catalog import get_catalog
+
+# Kinds of pages, stored as one byte per page (0 for pages that were not found, e.g. pages
+# past the end of a truncated file)
+PAGE_KINDS = (None, "table_interior", "table_leaf", "index_interior", "index_leaf", "overflow",
+	"freelist_trunk", "freelist_leaf", "ptrmap", "lock_byte")
+KIND_CODE = dict((kind, code) for code, kind in enumerate(PAGE_KINDS) if kind is not None)
+
+# Kind code of each b-tree page type byte, and back
+B_TREE_KIND = {
+	TABLE_INTERIOR: KIND_CODE["table_interior"],
+	TABLE_LEAF: KIND_CODE["table_leaf"],
+	INDEX_INTERIOR: KIND_CODE["index_interior"],
+	INDEX_LEAF: KIND_CODE["index_leaf"]
+}
+B_TREE_TYPE = dict((code, pg_type) for pg_type, code in B_TREE_KIND.items())
+
+# The lock-byte page holds the bytes at offset 1073741824 of the file
+LOCK_BYTE_OFFSET = 1073741824
+
+# Sidecar file: magic, then the key (change counter, number of pages, page size, WAL salts
+# and end of the last WAL commit), number of b-trees, then the kind and depth of every page
+# (one byte each, from page 0 to the last page) and (root, depth, pages, overflow pages) of
+# every b-tree
+SIDECAR_MAGIC = b"SQLPMAP1"
+SIDECAR_HEADER = struct.Struct('<8s5IQI')
+SIDECAR_SUFFIX = "-pagemap"
+
+class PageMap:
+	'''
+	Kind of every page of a database file, and the depth and number of pages of each b-tree.
+	Pages are indexed by their number in byte arrays, so looking a page up reads no page.
+	'''
+
+	def __init__(self, key, kinds, depths, trees):
+		'''
+		INPUT: key: state of the database the map was built from (see get_key)
+			kinds: array('B') of the code in PAGE_KINDS of every page
+			depths: array('B') of the depth of every b-tree page (0 for roots)
+			trees: dict of root page: (depth, pages, overflow pages) of every b-tree
+		'''
+		self.key = key
+		self.kinds = kinds
+		self.depths = depths
+		self.trees = trees
+
+	def page_kind(self, page):
+		'''
+		Return the kind of page (one of PAGE_KINDS), or None if it is unknown
+		'''
+		if page == 0:
+			page = 1
+		if page >= len(self.kinds):
+			return None
+		return PAGE_KINDS[self.kinds[page]]
+
+	def get_b_tree_type(self, page):
+		'''
+		Return the b-tree page type of page (as returned by helper.get_b_tree_type), or None
+		if it is not a b-tree page
+		'''
+		if page == 0:
+			page = 1
+		if page >= len(self.kinds):
+			return None
+		return B_TREE_TYPE.get(self.kinds[page])
+
+	def count(self, kind):
+		'''
+		Return the number of pages of a kind (one of PAGE_KINDS)
+		'''
+		return self.kinds.count(KIND_CODE[kind])
+
+def get_key(file):
+	'''
+	Return the state of the database read by file that a page map is valid for: the change
+	counter, number of pages and page size of the header, and the salts and end of the last
+	commit of the WAL (zeros if the database has no WAL)
+	'''
+	wal_key = (0, 0, 0)
+	if file.wal is not None and file.wal.header is not None:
+		wal_key = (file.wal.header[4], file.wal.header[5], file.wal.end)
+	return (file.change_counter, get_page_count(file), file.page_size) + wal_key
+
+def get_page_count(file):
+	'''
+	Return the number of pages of the database
+	'''
+	if file.wal is not None and file.wal.db_pages is not None:
+		return file.wal.db_pages
+	if file.num_pages:
+		return file.num_pages
+	# Files written by old versions may have no size in the header
+	return os.fstat(file.backend.file.fileno()).st_size // file.page_size
+
+def classify(file):
+	'''
+	Build the page map of a database in one pass: every b-tree in the catalog (and sqlite_master)
+	is walked from its root, following the overflow chains of its cells, then the freelist and
+	the pointer-map pages are added
+	OUTPUT: PageMap
+	'''
+	num_pages = get_page_count(file)
+	kinds = array('B', bytes(num_pages + 1))
+	depths = array('B', bytes(num_pages + 1))
+	trees = {}
+
+	roots = [1] + [entry.rootpage for entry in get_catalog(file).entries if entry.rootpage]
+	for root in roots:
+		depth = 0
+		pages = 0
+		overflow_pages = 0
+		stack = [(root, 0)]
+		while stack:
+			page, level = stack.pop()
+			data = file.get_page(page)
+			pg_type = format(data[get_page_hdr_offset(page)], '02x')
+			if pg_type not in B_TREE_KIND:
+				exit("Page " + str(page) + " is not a b-tree page. Exiting.")
+			kinds[page] = B_TREE_KIND[pg_type]
+			depths[page] = level
+			pages += 1
+			depth = max(depth, level + 1)
+
+			offset_to_ptr_arr = get_page_hdr_offset(page) + get_b_tree_hdr_size(pg_type)
+			num_cells = read_int(data, get_page_hdr_offset(page) + 3, 2)
+			if (pg_type == TABLE_INTERIOR or pg_type == INDEX_INTERIOR):
+				stack.append((read_int(data, get_page_hdr_offset(page) + 8, 4), level + 1))
+			for ptr in range(0, num_cells * 2, 2):
+				cell_offset = get_cell_offset(data, offset_to_ptr_arr, ptr)
+				if (pg_type == TABLE_INTERIOR):
+					stack.append((get_left_children(data, cell_offset), level + 1))
+					continue
+				if (pg_type == INDEX_INTERIOR):
+					stack.append((get_left_children(data, cell_offset), level + 1))
+					cell_offset += 4
+				payload_size, payload_offset = read_varint(data, cell_offset)
+				if (pg_type == TABLE_LEAF):
+					# Skip the rowid
+					_, payload_offset = read_varint(data, payload_offset)
+				local_size = get_local_payload_size(file, payload_size, pg_type)
+				if (local_size < payload_size):
+					# The first 4 bytes of each overflow page are the number of the next one
+					overflow = read_int(data, payload_offset + local_size, 4)
+					while overflow != 0:
+						kinds[overflow] = KIND_CODE["overflow"]
+						overflow_pages += 1
+						overflow = read_int(file.get_page(overflow), 0, 4)
+		trees[root] = (depth, pages, overflow_pages)
+
+	# Freelist: trunk pages hold the next trunk page, then the number and list of leaf pages
+	header = file.get_page(1)
+	trunk = read_int(header, 32, 4)
+	while trunk != 0:
+		kinds[trunk] = KIND_CODE["freelist_trunk"]
+		data = file.get_page(trunk)
+		for i in range(read_int(data, 4, 4)):
+			kinds[read_int(data, 8 + 4 * i, 4)] = KIND_CODE["freelist_leaf"]
+		trunk = read_int(data, 0, 4)
+
+	# Pointer-map pages only exist in auto-vacuum databases (with a largest root page), as
+	# page 2 and then every usable_size / 5 + 1 pages
+	if read_int(header, 52, 4) != 0:
+		page = 2
+		while page <= num_pages:
+			kinds[page] = KIND_CODE["ptrmap"]
+			page += file.usable_size // 5 + 1
+
+	lock_byte_page = LOCK_BYTE_OFFSET // file.page_size + 1
+	if lock_byte_page <= num_pages:
+		kinds[lock_byte_page] = KIND_CODE["lock_byte"]
+
+	return PageMap(get_key(file), kinds, depths, trees)
+
+def save_page_map(page_map, path):
+	'''
+	Write a page map to a sidecar file (replaced at once, so readers never see half of it)
+	'''
+	tree_values = array('I')
+	for root, (depth, pages, overflow_pages) in sorted(page_map.trees.items()):
+		tree_values.extend((root, depth, pages, overflow_pages))
+	temp_path = path + ".tmp"
+	with open(temp_path, 'wb') as out:
+		out.write(SIDECAR_HEADER.pack(SIDECAR_MAGIC, *page_map.key, len(page_map.trees)))
+		out.write(page_map.kinds.tobytes())
+		out.write(page_map.depths.tobytes())
+		out.write(tree_values.tobytes())
+	os.replace(temp_path, path)
+
+def load_page_map(path, key):
+	'''
+	Read the page map of a sidecar file
+	OUTPUT: PageMap, or None if there is no sidecar file or it was built for another key
+	'''
+	try:
+		with open(path, 'rb') as sidecar:
+			data = sidecar.read()
+	except OSError:
+		return None
+	if len(data) < SIDECAR_HEADER.size:
+		return None
+	fields = SIDECAR_HEADER.unpack_from(data)
+	if fields[0] != SIDECAR_MAGIC or tuple(fields[1:7]) != key:
+		return None
+	num_pages = key[1]
+	offset = SIDECAR_HEADER.size
+	kinds = array('B', data[offset:offset + num_pages + 1])
+	depths = array('B', data[offset + num_pages + 1:offset + 2 * (num_pages + 1)])
+	tree_values = array('I')
+	tree_values.frombytes(data[offset + 2 * (num_pages + 1):])
+	if len(kinds) != num_pages + 1 or len(depths) != num_pages + 1 or len(tree_values) != 4 * fields[7]:
+		return None
+	trees = dict((tree_values[i], tuple(tree_values[i + 1:i + 4])) for i in range(0, len(tree_values), 4))
+	return PageMap(key, kinds, depths, trees)
+
+def get_page_map(file, save=True):
+	'''
+	Return the page map of the database read by file, and keep it with the Pager so that
+	helper.get_b_tree_type reads page types from it. It is loaded from the sidecar file next to
+	the database (<database>-pagemap) if it was built for the current state of the database,
+	and otherwise built with classify (and saved in the sidecar file if save is True).
+	'''
+	file.refresh()
+	key = get_key(file)
+	if file.page_map is not None and file.page_map.key == key:
+		return file.page_map
+	path = file.path + SIDECAR_SUFFIX if file.path is not None else None
+	page_map = load_page_map(path, key) if path is not None else None
+	if page_map is None:
+		page_map = classify(file)
+		if save and path is not None:
+			save_page_map(page_map, path)
+	file.page_map = page_map
+	return page_map
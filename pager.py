@@ -0,0 +1,302 @@
+from collections import OrderedDict
+import os
+import mmap
+import threading
+from stats import QueryStats
+from wal import Wal
+
+# Size of the database file header at the start of the first page
+HEADER_SIZE = 100
+
+# Default number of pages kept in memory at once
+CACHE_PAGES = 2048
+
+# Text encoding of the database, stored at offset 56 of the file header
+TEXT_ENCODING = {
+	1: 'utf-8',
+	2: 'utf-16-le',
+	3: 'utf-16-be'
+}
+
+class FileBackend:
+	'''
+	Reads bytes from the database file with seek + read. Every read returns a copy as bytes.
+	'''
+	# Pages are copies, so the pager keeps them in its cache
+	zero_copy = False
+
+	def __init__(self, file):
+		'''
+		INPUT: file: database file opened in binary mode
+		'''
+		self.file = file
+
+	def read(self, offset, length):
+		'''
+		Return length bytes starting from the absolute file offset.
+		'''
+		if hasattr(os, 'pread'):
+			# Bypass the buffer of the file object, which would return stale bytes after the
+			# file is written to by another process
+			return os.pread(self.file.fileno(), length, offset)
+		self.file.seek(offset)
+		return self.file.read(length)
+
+	def refresh(self):
+		'''
+		Nothing to do, since every read goes to the file.
+		'''
+		pass
+
+	def close(self):
+		self.file.close()
+
+class MmapBackend:
+	'''
+	Maps the whole database file into memory. Every read returns a memoryview slice of the
+	mapping, so no bytes are copied and the OS page cache is shared by all processes reading
+	the file.
+	'''
+	# Pages are views into the mapping, so there is nothing for the pager to cache
+	zero_copy = True
+
+	def __init__(self, file):
+		'''
+		INPUT: file: database file opened in binary mode
+		'''
+		self.file = file
+		self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+		self.view = memoryview(self.map)
+
+	def read(self, offset, length):
+		'''
+		Return a memoryview of length bytes starting from the absolute file offset.
+		'''
+		return self.view[offset:offset + length]
+
+	def refresh(self):
+		'''
+		Map the file again so that the mapping covers pages added since it was mapped.
+		'''
+		self.unmap()
+		self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+		self.view = memoryview(self.map)
+
+	def unmap(self):
+		self.view.release()
+		try:
+			self.map.close()
+		except BufferError:
+			# Pages handed out by read() are still referenced somewhere. The mapping is
+			# unmapped once the last of them is garbage collected.
+			pass
+
+	def close(self):
+		self.unmap()
+		self.file.close()
+
+class Pager:
+	'''
+	Reads a database file one whole page at a time. With the file backend, the most recently
+	used pages are kept in an LRU cache, so that every field access is served from memory
+	instead of a seek + read on the file. With the mmap backend, pages are zero-copy views of
+	the mapped file. If the database is in WAL mode, pages with a committed frame in the -wal
+	file are read from their latest frame instead (and kept in the cache with either backend).
+	'''
+
+	def __init__(self, file, cache_pages=CACHE_PAGES, use_mmap=False):
+		'''
+		INPUT: file: database file opened in binary mode
+			cache_pages: maximum number of pages held in the cache
+			use_mmap: True to memory-map the file instead of reading it
+		'''
+		if use_mmap:
+			self.backend = MmapBackend(file)
+		else:
+			self.backend = FileBackend(file)
+		self.cache_pages = cache_pages
+		self.cache = OrderedDict()
+		# Held while the cache is read or updated, so that threads can share the Pager
+		self.lock = threading.RLock()
+		# Schema of the database, built by catalog.get_catalog
+		self.catalog = None
+		# Kind of every page, built or loaded by pagemap.get_page_map
+		self.page_map = None
+		# Hash indexes mapped by hashindex.get_hash_index, by (table, column)
+		self.hash_indexes = {}
+		# Measurements of the queries reading the file
+		self.stats = QueryStats()
+		# Hooks called by the traversals (see tracing.py), None when they are not traced
+		self.tracer = None
+
+		# Path to the database file (None for file objects without a name), next to which the
+		# WAL and the sidecar files are kept
+		name = getattr(file, 'name', None)
+		self.path = name if isinstance(name, str) else None
+		# Write-ahead log next to the database file, if the database is in WAL mode
+		self.wal_path = self.path + "-wal" if self.path is not None else None
+		self.wal = None
+		self.refresh_wal()
+		# Incremented every time refresh finds that the database was modified
+		self.data_version = 0
+
+		# Page size and number of pages are read from the file header only once
+		self.load_header()
+
+	def read_file(self, offset, length):
+		'''
+		Return length bytes starting from the absolute file offset, read from the backend
+		'''
+		data = self.backend.read(offset, length)
+		# Reads from the mapping of the mmap backend are not system calls
+		self.stats.read(len(data), 0 if self.backend.zero_copy else 1)
+		return data
+
+	def load_header(self):
+		'''
+		Read the database header, from the latest frame of the first page in the WAL if it has one
+		'''
+		header = self.read_file(0, HEADER_SIZE)
+		# Change counter of the file itself, to tell when it is written to (e.g. by a checkpoint)
+		self.file_change_counter = int.from_bytes(header[24:28], 'big')
+		if self.wal is not None and 1 in self.wal.frames:
+			header = self.wal.read_page(1)[:HEADER_SIZE]
+		self.read_header(header)
+
+	def read_header(self, header):
+		'''
+		Keep the fields of the database file header that are needed to read the pages
+		'''
+		self.page_size = int.from_bytes(header[16:18], 'big')
+		if self.page_size == 1:
+			# As specified in the file format docs, 1 represents a page size of 65536
+			self.page_size = 65536
+		# Bytes at the end of every page reserved for extensions are not used by the b-trees
+		self.usable_size = self.page_size - header[20]
+		# Incremented every time the database is modified
+		self.change_counter = int.from_bytes(header[24:28], 'big')
+		self.num_pages = int.from_bytes(header[28:32], 'big')
+		# An encoding of 0 means the database is still empty, so default to UTF-8
+		self.encoding = TEXT_ENCODING.get(int.from_bytes(header[56:60], 'big'), 'utf-8')
+
+	def refresh(self):
+		'''
+		Check the file change counter on disk (bypassing the cache) and the frames committed to
+		the WAL since the last check. If the database has been modified, drop the cached pages
+		that may have changed (only the pages with new frames if transactions were only added
+		to the WAL) and read the header again.
+		OUTPUT: True if the database was modified, False otherwise
+		'''
+		# Threads reading pages wait until the cache and the WAL are up to date
+		with self.lock:
+			changed = self.refresh_wal()
+			header = self.read_file(0, HEADER_SIZE)
+			file_modified = int.from_bytes(header[24:28], 'big') != self.file_change_counter
+			if not file_modified and changed is not None and not changed:
+				return False
+			if file_modified or changed is None:
+				self.cache.clear()
+				self.backend.refresh()
+			else:
+				for page in changed:
+					self.cache.pop(page, None)
+			# Pages may have been allocated, freed or split, so the page map no longer holds
+			self.page_map = None
+			self.load_header()
+			self.data_version += 1
+			return True
+
+	def refresh_wal(self):
+		'''
+		Read the frames committed to the WAL since the last call, opening the WAL if it was
+		created and closing it if it was deleted (e.g. when the last connection closed it)
+		OUTPUT: set of pages with new committed frames, or None if every page may have changed
+		'''
+		exists = self.wal_path is not None and os.path.exists(self.wal_path)
+		if self.wal is None:
+			if not exists:
+				return set()
+			self.wal = Wal(self.wal_path)
+			return set(self.wal.frames)
+		if exists and os.stat(self.wal_path).st_ino == os.fstat(self.wal.file.fileno()).st_ino:
+			return self.wal.update()
+		# The WAL was deleted (and maybe created again)
+		self.wal.close()
+		self.wal = None
+		if exists:
+			self.wal = Wal(self.wal_path)
+		return None
+
+	def get_page(self, page):
+		'''
+		Return the contents of page as bytes (or a memoryview with the mmap backend). Pages
+		are numbered from 1, and page 0 (the root page holding the file header) refers to
+		the same page as page 1.
+		'''
+		if page == 0:
+			page = 1
+
+		in_wal = self.wal is not None and page in self.wal.frames
+		if self.backend.zero_copy and not in_wal:
+			return self.read_file((page - 1) * self.page_size, self.page_size)
+
+		# The cache and the reads of the WAL (seek + read) are shared by every thread reading
+		# the file
+		with self.lock:
+			data = self.cache.get(page)
+			if data is not None:
+				self.stats.add('cache_hits')
+				self.cache.move_to_end(page)
+				return data
+
+			self.stats.add('cache_misses')
+			if in_wal:
+				data = self.wal.read_page(page)
+				self.stats.read(len(data), 1)
+			else:
+				data = self.read_file((page - 1) * self.page_size, self.page_size)
+
+			self.cache[page] = data
+			if len(self.cache) > self.cache_pages:
+				# Evict the least recently used page
+				self.cache.popitem(last=False)
+			return data
+
+	def read(self, offset, length):
+		'''
+		Return length bytes starting from the absolute file offset (may span pages).
+		'''
+		page = offset // self.page_size + 1
+		start = offset % self.page_size
+		data = self.get_page(page)
+		if start + length <= self.page_size:
+			return data[start:start + length]
+		# Rest of the bytes are on the next page
+		return bytes(data[start:]) + bytes(self.read(page * self.page_size, length - (self.page_size - start)))
+
+	def close(self):
+		'''
+		Drop all cached pages and close the underlying file.
+		'''
+		self.cache.clear()
+		for index in self.hash_indexes.values():
+			index.close()
+		self.hash_indexes = {}
+		self.backend.close()
+		if self.wal is not None:
+			self.wal.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+def open_database(file_path, cache_pages=CACHE_PAGES, use_mmap=False):
+	'''
+	INPUT: file_path: path to the database file
+		cache_pages: maximum number of pages held in the cache (file backend only)
+		use_mmap: True to memory-map the file, False to read it with a plain file
+	OUTPUT: Pager over the database file
+	'''
+	return Pager(open(file_path, 'rb'), cache_pages, use_mmap)
@@ -0,0 +1,159 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from cursor import Table
+from stats import QueryStats
+from pager import open_database
+from helper import *
+from predicate import Predicate, EQUAL
+
+# Number of work units per worker, so that workers that finish early can pick up more work
+UNITS_PER_WORKER = 4
+
+def split_subtrees(file, table, position, predicate, num_subtrees):
+	'''
+	Read the root and upper interior levels of a table one level at a time, until the level
+	holds at least num_subtrees subtrees (or the leaves are reached).
+
+	INPUT: file: Pager over the database file to be read
+		table: cursor.Table to scan
+		position: position of the column to match
+		predicate: predicate.Predicate the column must satisfy
+		num_subtrees: number of subtrees to split the table into
+	OUTPUT: list in key order of subtree root pages, and of the matching rows (lists of values)
+		stored in the interior pages read (interior pages of index b-trees hold entries)
+	'''
+	items = [table.entry.rootpage]
+	while len(items) < num_subtrees:
+		pages = [item for item in items if isinstance(item, int)]
+		# b-trees are balanced, so every page of a level has the same kind
+		if get_b_tree_type(file, pages[0]) in (TABLE_LEAF, INDEX_LEAF):
+			break
+
+		next_level = []
+		for item in items:
+			if not isinstance(item, int):
+				next_level.append(item)
+				continue
+			pg_type = get_b_tree_type(file, item)
+			count_page(file, pg_type, item)
+			data = file.get_page(item)
+			offset_to_ptr_arr = offset_to_cell_ptr_arr(file, item)
+			for ptr in range(0, get_num_cells(file, item) * 2, 2):
+				cell_offset = get_cell_offset(data, offset_to_ptr_arr, ptr)
+				next_level.append(get_left_children(data, cell_offset))
+				if (pg_type == INDEX_INTERIOR):
+					# The entry of the cell comes after every entry of its left child
+					entry = get_cell_record(file, data, cell_offset, pg_type)
+					if entry.match(position, predicate):
+						match_row(file)
+						next_level.append(list(entry))
+			next_level.append(get_right_children(file, item))
+			leave_page(file, item)
+		items = next_level
+	return items
+
+def scan_items(file, table, position, predicate, items):
+	'''
+	Return the rows (lists of values) whose column at position satisfies predicate
+	(predicate.Predicate), from a list of
+	subtree root pages and rows (see split_subtrees), in key order
+	'''
+	rows = []
+	for item in items:
+		if not isinstance(item, int):
+			# Row already matched in an interior page
+			rows.append(item)
+			continue
+		for record in table.rows(page=item):
+			if record.match(position, predicate):
+				match_row(file)
+				rows.append(list(record))
+	return rows
+
+# Handle on the database and table opened once by each worker process, and the predicate
+# of the scan compiled once for the worker
+worker_file = None
+worker_table = None
+worker_position = None
+worker_predicate = None
+
+def open_worker(db_file, table_name, use_mmap, column, value):
+	'''
+	Worker process initializer: open the worker's own handle on the database and compile the
+	predicate of the scan, kept for every work unit the worker scans
+	'''
+	global worker_file, worker_table, worker_position, worker_predicate
+	worker_file = open_database(db_file, use_mmap=use_mmap)
+	worker_table = Table(worker_file, table_name)
+	worker_position = worker_table.column_position(column)
+	worker_predicate = Predicate(EQUAL, value, encoding=worker_file.encoding)
+
+def scan_subtrees(items):
+	'''
+	Worker process: scan a work unit (see scan_items) with the worker's handle.
+	OUTPUT: (matching rows, stats of the worker for this work unit)
+	'''
+	rows = scan_items(worker_file, worker_table, worker_position, worker_predicate, items)
+	# The stats of the first work unit also include the opening of the handle
+	stats = worker_file.stats
+	stats.stop()
+	worker_file.stats = QueryStats()
+	return rows, stats
+
+def parallel_scan(db_file, table_name, column, value, workers=None, use_mmap=False, stats=None):
+	'''
+	Full scan of a table for the rows whose column equals value, with the subtrees of the
+	table spread over a pool of worker processes. The root and upper interior levels are read
+	here and split into work units of roughly equal size, and the stats of this process and
+	of the workers are added to stats.
+
+	INPUT:
+		db_file: path to the database file
+		table_name: name of the table to scan
+		column: name of the column to compare to value
+		value: value the column must be equal to
+		workers: number of worker processes (number of CPUs if None)
+		use_mmap: True to memory-map the file in every process
+		stats: stats.QueryStats to add the measurements of the scan to (None to drop them)
+	OUTPUT: list of matching rows (lists of values), in key order
+	'''
+	if workers is None:
+		workers = os.cpu_count()
+	if stats is None:
+		stats = QueryStats()
+
+	with open_database(db_file, use_mmap=use_mmap) as f:
+		f.stats = stats
+		table = Table(f, table_name)
+		position = table.column_position(column)
+		# Records are matched on the encoded bytes of the column
+		predicate = Predicate(EQUAL, value, encoding=f.encoding)
+		items = split_subtrees(f, table, position, predicate, workers * UNITS_PER_WORKER)
+
+		if workers <= 1 or len(items) == 1:
+			# Nothing to spread over several processes
+			return scan_items(f, table, position, predicate, items)
+		stats.stop()
+
+	# Split the subtrees into contiguous work units with about the same number of subtrees
+	num_pages = sum(1 for item in items if isinstance(item, int))
+	pages_per_unit = -(-num_pages // (workers * UNITS_PER_WORKER))
+	units = [[]]
+	pages = 0
+	for item in items:
+		if isinstance(item, int):
+			if (pages == pages_per_unit):
+				units.append([])
+				pages = 0
+			pages += 1
+		units[-1].append(item)
+
+	rows = []
+	with ProcessPoolExecutor(workers, initializer=open_worker, initargs=(db_file, table_name, use_mmap, column, value)) as executor:
+		futures = [executor.submit(scan_subtrees, unit) for unit in units]
+		# Results are collected in submission order, so rows stay in key order
+		for future in futures:
+			unit_rows, unit_stats = future.result()
+			rows.extend(unit_rows)
+			stats.merge(unit_stats)
+	return rows
@@ -0,0 +1,141 @@
+import struct
+
+# Kinds of predicates
+EQUAL = "="
+PREFIX = "prefix"
+RANGE = "range"
+
+# Size of the content of the integer serial types 1-6
+INTEGER_SIZES = {1: 1, 2: 2, 3: 3, 4: 4, 5: 6, 6: 8}
+
+def is_text(serial):
+	return serial >= 13 and serial % 2 == 1
+
+class Predicate:
+	'''
+	Condition on one column, compiled into checks on the encoded bytes of the column in a
+	record: the literal is encoded once, so that most records are accepted or rejected by
+	looking at the serial type of the column (its type and length) and comparing a slice of
+	the record to the encoded literal, without decoding the column into a Python value.
+
+	matches(data, serial, offset) runs these checks, and returns None when the column has to
+	be decoded; matches_value(value) then checks the decoded value.
+	'''
+
+	def __init__(self, op, value, high=None, encoding='utf-8', as_text=False):
+		'''
+		INPUT: op: EQUAL (column = value), PREFIX (text column starting with value) or RANGE
+				(value <= column <= high)
+			value: literal to compare the column to (or lower bound of the range)
+			high: upper bound of the range (RANGE only)
+			encoding: text encoding of the database
+			as_text: True to compare columns by their text form like binary_search does:
+				str(column) == value for EQUAL, and int(str(column)) between int(value)
+				and int(high) for RANGE
+		'''
+		self.op = op
+		self.value = value
+		self.high = high
+		self.encoding = encoding
+		self.as_text = as_text
+		# Encoded content the column must have for each serial type it can match with (EQUAL)
+		self.encoded = {}
+
+		if (op == EQUAL):
+			if isinstance(value, str):
+				text = value.encode(encoding)
+				self.encoded[13 + 2 * len(text)] = text
+				if as_text and value.lstrip("-").isdecimal() and str(int(value)) == value:
+					# Integers whose text form is the literal
+					self.add_integer(int(value))
+			elif isinstance(value, bytes):
+				self.encoded[12 + 2 * len(value)] = value
+			elif isinstance(value, int) and not as_text:
+				self.add_integer(value)
+		elif (op == PREFIX):
+			self.encoded_prefix = value.encode(encoding)
+		elif (op == RANGE):
+			if as_text:
+				# Bounds are compared as integers
+				self.value = int(value)
+				self.high = int(high)
+			elif isinstance(value, str) and encoding == 'utf-8':
+				# UTF-8 bytes sort in the same order as the text they encode
+				self.encoded_low = value.encode(encoding)
+				self.encoded_high = high.encode(encoding)
+
+	def add_integer(self, value):
+		'''
+		Add the encodings of an integer with every integer serial type it fits in
+		'''
+		if (value == 0 or value == 1):
+			# Serial types 8 and 9 are the constants 0 and 1, with no content
+			self.encoded[8 + value] = b""
+		for serial, size in INTEGER_SIZES.items():
+			if (-(1 << (size * 8 - 1)) <= value < (1 << (size * 8 - 1))):
+				self.encoded[serial] = value.to_bytes(size, 'big', signed=True)
+
+	def matches(self, data, serial, offset):
+		'''
+		Check the column of serial type serial whose content starts at offset in data.
+		OUTPUT: True or False, or None if the column must be decoded and checked with
+			matches_value
+		'''
+		if (self.op == EQUAL):
+			encoded = self.encoded.get(serial)
+			if encoded is not None:
+				return data[offset:offset + len(encoded)] == encoded
+			if (serial == 7 or isinstance(self.value, float) or self.value is None):
+				# Floats are compared by value
+				return None
+			if self.as_text and not is_text(serial) and not (1 <= serial <= 6 or serial in (8, 9)):
+				# NULLs and blobs are compared by their text form
+				return None
+			# The type or length of the column differs from the literal
+			return False
+
+		elif (self.op == PREFIX):
+			length = len(self.encoded_prefix)
+			if not is_text(serial) or (serial - 13) // 2 < length:
+				return False
+			return data[offset:offset + length] == self.encoded_prefix
+
+		elif (self.op == RANGE):
+			if not isinstance(self.value, str):
+				if (1 <= serial <= 6):
+					number = int.from_bytes(data[offset:offset + INTEGER_SIZES[serial]], 'big', signed=True)
+				elif (serial == 8 or serial == 9):
+					number = serial - 8
+				elif (serial == 7 and not self.as_text):
+					number = struct.unpack_from('>d', data, offset)[0]
+				elif self.as_text:
+					return None
+				else:
+					return False
+				return self.value <= number <= self.high
+			if not is_text(serial):
+				return False
+			if self.encoding != 'utf-8':
+				return None
+			content = bytes(data[offset:offset + (serial - 13) // 2])
+			return self.encoded_low <= content <= self.encoded_high
+
+		exit("Unknown predicate " + str(self.op) + ". Exiting.")
+
+	def matches_value(self, value):
+		'''
+		Check a decoded column value
+		'''
+		if (self.op == EQUAL):
+			if self.as_text:
+				return str(value) == self.value
+			return value == self.value
+		elif (self.op == PREFIX):
+			return isinstance(value, str) and value.startswith(self.value)
+		elif (self.op == RANGE):
+			if self.as_text:
+				return self.value <= int(str(value)) <= self.high
+			if isinstance(self.value, str):
+				return isinstance(value, str) and self.value <= value <= self.high
+			return isinstance(value, (int, float)) and self.value <= value <= self.high
+		exit("Unknown predicate " + str(self.op) + ". Exiting.")
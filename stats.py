@@ -0,0 +1,124 @@
+import threading
+import timeit
+
+# Types of the pages counted by visit_page
+PAGE_TYPES = ("table_leaf", "table_interior", "index_leaf", "index_interior", "overflow")
+
+# Other counters
+COUNTERS = ("header_reads", "bytes_read", "read_calls", "cache_hits", "cache_misses", "cells_decoded", "rows_matched")
+
+class QueryStats:
+	'''
+	Measurements of the queries run on a database file, attached to its Pager (file.stats).
+	A query that needs its own measurements replaces it with a new QueryStats before it
+	starts. Every update holds a lock, so a Pager can be shared by several threads, and the
+	stats of worker processes (which are pickled back with their results) are added with merge.
+	'''
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		# Number of pages read of each type, and time spent on them
+		self.pages = dict((page_type, 0) for page_type in PAGE_TYPES)
+		self.time = dict((page_type, 0.0) for page_type in PAGE_TYPES)
+		self.counts = dict((name, 0) for name in COUNTERS)
+		# Every page number read, to tell distinct pages from pages read again
+		self.visited = set()
+		self.page_reads = 0
+		# Page each thread is on, and when it was entered
+		self.current = threading.local()
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		del state['lock']
+		del state['current']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.lock = threading.Lock()
+		self.current = threading.local()
+
+	def add(self, name, amount=1):
+		'''
+		Add amount to one of the COUNTERS
+		'''
+		with self.lock:
+			self.counts[name] += amount
+
+	def read(self, length, calls):
+		'''
+		Count length bytes read from the file with calls read system calls
+		'''
+		with self.lock:
+			self.counts['bytes_read'] += length
+			self.counts['read_calls'] += calls
+
+	def visit_page(self, page_type, page):
+		'''
+		Count a visit of a page of one of the PAGE_TYPES (None for another type). The time
+		until the same thread visits its next page (or stop is called) is counted as time
+		spent on this page type.
+		'''
+		now = timeit.default_timer()
+		with self.lock:
+			self.page_reads += 1
+			self.visited.add(page)
+			if page_type is not None:
+				self.pages[page_type] += 1
+			self.stop_page(now)
+		self.current.page_type = page_type
+		self.current.start = now
+
+	def stop_page(self, now):
+		'''
+		Add the time since the current thread entered its page to the time of its page type
+		'''
+		page_type = getattr(self.current, 'page_type', None)
+		if page_type is not None:
+			self.time[page_type] += now - self.current.start
+		self.current.page_type = None
+
+	def stop(self):
+		'''
+		Stop timing the page the current thread is on (at the end of a query)
+		'''
+		now = timeit.default_timer()
+		with self.lock:
+			self.stop_page(now)
+
+	def distinct_pages(self):
+		return len(self.visited)
+
+	def repeated_pages(self):
+		'''
+		Return the number of page visits to a page that had already been visited
+		'''
+		return self.page_reads - len(self.visited)
+
+	def merge(self, other):
+		'''
+		Add the measurements of another QueryStats (e.g. of a worker process)
+		'''
+		with self.lock:
+			self.page_reads += other.page_reads
+			self.visited |= other.visited
+			for page_type in PAGE_TYPES:
+				self.pages[page_type] += other.pages[page_type]
+				self.time[page_type] += other.time[page_type]
+			for name in COUNTERS:
+				self.counts[name] += other.counts[name]
+
+	def to_dict(self):
+		'''
+		Return the measurements as a dict (e.g. for a JSON report)
+		'''
+		with self.lock:
+			result = {
+				"page_reads": self.page_reads,
+				"distinct_pages": len(self.visited),
+				"repeated_pages": self.page_reads - len(self.visited)
+			}
+			result.update(self.pages)
+			result.update(self.counts)
+			result["time"] = dict(self.time)
+		return result
@@ -0,0 +1,45 @@
+import sqlite3
+import pytest
+from pager import open_database
+from stats import QueryStats
+from benchmark import run_once, measure
+
+OPTIONS = {"use_mmap": False, "scan_workers": 1, "use_numpy": False, "shared_scan": False,
+	"use_page_map": False, "use_hash_index": False, "trace_dir": None}
+
+def create_employees(db_file, without_rowid):
+	'''
+	Create an Employee table with an index on Emp_ID, keyed on Emp_ID (WITHOUT ROWID) or on
+	the rowid
+	'''
+	conn = sqlite3.connect(db_file)
+	conn.execute('PRAGMA page_size = 512')
+	if without_rowid:
+		conn.execute('CREATE TABLE Employee (Last_Name TEXT PRIMARY KEY, Emp_ID INTEGER) WITHOUT ROWID')
+	else:
+		conn.execute('CREATE TABLE Employee (Last_Name TEXT, Emp_ID INTEGER)')
+	conn.execute('CREATE INDEX Emp_ID_idx ON Employee (Emp_ID)')
+	conn.executemany('INSERT INTO Employee VALUES (?, ?)', [("name" + str(i), 1000 + i) for i in range(3000)])
+	conn.commit()
+	conn.close()
+
+@pytest.mark.parametrize("without_rowid", [False, True])
+def test_rows_matched_index_lookup(tmp_path, without_rowid):
+	db_file = str(tmp_path / "employees.db")
+	create_employees(db_file, without_rowid)
+	with open_database(db_file) as f:
+		for query, key in [("equality", 2500), ("range", (1800, 1899))]:
+			f.stats = QueryStats()
+			rows = run_once(f, db_file, "Employee", query, "Emp_ID", key, OPTIONS)
+			assert len(rows) == (1 if query == "equality" else 100)
+			# Rows found through the index are counted once, not once more for their index entry
+			assert f.stats.counts["rows_matched"] == len(rows)
+
+def test_shared_scan_query_counts(tmp_path):
+	db_file = str(tmp_path / "employees.db")
+	create_employees(db_file, False)
+	queries = [("scan", "Last_Name", "name7"), ("equality", "Emp_ID", 2500), ("range", "Emp_ID", (1800, 1899))]
+	result = measure(db_file, "Employee", "shared", None, queries, "warm", 1, OPTIONS)
+	assert [(counts["query"], counts["rows"], counts["checked"], counts["matched"]) for counts in result["queries"]] == [
+		("scan", 1, 3000, 1), ("equality", 1, 3000, 1), ("range", 100, 3000, 100)]
+	assert result["rows"] == 102
@@ -0,0 +1,50 @@
+import os
+import sqlite3
+from pager import open_database
+from stats import QueryStats
+from hashindex import get_hash_index, get_hash_index_path
+
+VALUES = ["n0", "n5", "n996", "missing"]
+
+def check_lookups(index, conn):
+	for value in VALUES:
+		expected = conn.execute('SELECT a, b, c FROM t WHERE b = ? ORDER BY a', (value,)).fetchall()
+		assert sorted(tuple(record) for record in index.lookup(value)) == expected
+
+def test_hash_index_after_wal_changes(tmp_path):
+	db_file = str(tmp_path / "hash.db")
+	conn = sqlite3.connect(db_file)
+	conn.execute('PRAGMA journal_mode = WAL')
+	conn.execute('PRAGMA wal_autocheckpoint = 0')
+	conn.execute('CREATE TABLE t (a INTEGER, b TEXT, c TEXT)')
+	# Every 500th row spills onto overflow pages
+	conn.executemany('INSERT INTO t VALUES (?, ?, ?)',
+		[(i, "n" + str(i % 997), "q" * 5000 if i % 500 == 0 else "x" * 150) for i in range(20000)])
+	conn.commit()
+
+	with open_database(db_file) as f:
+		f.stats = QueryStats()
+		check_lookups(get_hash_index(f, "t", "b"), conn)
+		full_reads = f.stats.page_reads
+
+		# Updated, inserted, rewritten overflowing and deleted rows, all in the WAL
+		conn.execute('UPDATE t SET b = ? WHERE a = 12345', ("n5",))
+		conn.execute('INSERT INTO t VALUES (99999, ?, ?)', ("n5", "new"))
+		conn.execute('UPDATE t SET c = ? || c, b = ? WHERE a = 1000', ("r", "n0"))
+		conn.execute('DELETE FROM t WHERE a < 3000')
+		conn.commit()
+		f.stats = QueryStats()
+		index = get_hash_index(f, "t", "b")
+		# Only the pages changed in the WAL are decoded again
+		assert f.stats.page_reads < full_reads
+		check_lookups(index, conn)
+
+		sidecar = os.stat(get_hash_index_path(f, "t", "b"))
+
+	# A new handle maps the sidecar file without building the index again (a rebuilt index
+	# replaces the file)
+	with open_database(db_file) as f:
+		index = get_hash_index(f, "t", "b")
+		assert os.stat(get_hash_index_path(f, "t", "b")).st_ino == sidecar.st_ino
+		check_lookups(index, conn)
+	conn.close()
@@ -0,0 +1,57 @@
+import random
+import sqlite3
+import pytest
+from pager import open_database
+from catalog import get_catalog
+from helper import find_by_key, iter_key_range
+
+def random_keys(count, seed=0):
+	'''
+	Return count distinct strings mixing ASCII, BMP characters on both sides of the surrogate
+	range and characters outside the BMP, whose UTF-8, UTF-16LE and UTF-16BE bytes sort differently
+	'''
+	rnd = random.Random(seed)
+	keys = set()
+	while len(keys) < count:
+		keys.add("".join(chr(rnd.choice([rnd.randint(0x41, 0x7a), rnd.randint(0x100, 0x2fff),
+			rnd.randint(0xe000, 0xffef), rnd.randint(0x10000, 0x1f600)])) for _ in range(rnd.randint(1, 6))))
+	return sorted(keys)
+
+def create_keyed_table(db_file, encoding, keys):
+	'''
+	Create a WITHOUT ROWID table keyed on text in the given encoding, with small pages so that
+	its b-tree has several levels
+	'''
+	conn = sqlite3.connect(db_file)
+	conn.execute('PRAGMA encoding = "{encoding}"'.format(encoding=encoding))
+	conn.execute('PRAGMA page_size = 512')
+	conn.execute('CREATE TABLE t (k TEXT PRIMARY KEY, v INTEGER) WITHOUT ROWID')
+	conn.executemany('INSERT INTO t VALUES (?, ?)', [(key, i) for i, key in enumerate(keys)])
+	conn.commit()
+	conn.close()
+
+@pytest.mark.parametrize("encoding", ["UTF-8", "UTF-16le", "UTF-16be"])
+def test_find_by_key_text(tmp_path, encoding):
+	db_file = str(tmp_path / "keys.db")
+	keys = random_keys(900)
+	create_keyed_table(db_file, encoding, keys)
+	with open_database(db_file) as f:
+		root = get_catalog(f).table("t").rootpage
+		for i, key in enumerate(keys):
+			assert list(find_by_key(f, root, [key])) == [key, i]
+		assert find_by_key(f, root, ["not a key"]) is None
+
+@pytest.mark.parametrize("encoding", ["UTF-8", "UTF-16le", "UTF-16be"])
+def test_iter_key_range_text(tmp_path, encoding):
+	db_file = str(tmp_path / "keys.db")
+	keys = random_keys(900)
+	create_keyed_table(db_file, encoding, keys)
+	conn = sqlite3.connect(db_file)
+	with open_database(db_file) as f:
+		root = get_catalog(f).table("t").rootpage
+		for low, high in [(keys[10], keys[40]), (keys[300], keys[700]), (keys[850], None), (None, keys[5])]:
+			expected = [row[0] for row in conn.execute("SELECT k FROM t WHERE k >= coalesce(?, '') AND (? IS NULL OR k <= ?) ORDER BY k",
+				(low, high, high))]
+			entries = iter_key_range(f, root, None if low is None else [low], None if high is None else [high])
+			assert [entry[0] for entry in entries] == expected
+	conn.close()
@@ -0,0 +1,20 @@
+import sqlite3
+import pytest
+from parallel import parallel_scan
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_scan_added_column(tmp_path, workers):
+	db_file = str(tmp_path / "added.db")
+	conn = sqlite3.connect(db_file)
+	conn.execute('PRAGMA page_size = 512')
+	conn.execute('CREATE TABLE t (a INTEGER, b TEXT)')
+	conn.executemany('INSERT INTO t VALUES (?, ?)', [(i, str(i % 7)) for i in range(2000)])
+	# Records written before the column was added are shorter than the schema
+	conn.execute('ALTER TABLE t ADD COLUMN c INTEGER')
+	conn.executemany('INSERT INTO t VALUES (?, ?, ?)', [(i, str(i % 7), i % 3) for i in range(2000, 4000)])
+	conn.commit()
+	for column, value in [("c", 1), ("b", "3")]:
+		expected = conn.execute('SELECT a, b, c FROM t WHERE ' + column + ' = ? ORDER BY rowid', (value,)).fetchall()
+		rows = parallel_scan(db_file, "t", column, value, workers)
+		assert [tuple(row[:2]) + (row[2] if len(row) > 2 else None,) for row in rows] == expected
+	conn.close()
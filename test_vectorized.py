@@ -0,0 +1,20 @@
+import sqlite3
+from pager import open_database
+from cursor import Table
+from vectorized import vectorized_scan
+
+def test_vectorized_scan_added_column(tmp_path):
+	db_file = str(tmp_path / "added.db")
+	conn = sqlite3.connect(db_file)
+	conn.execute('CREATE TABLE t (a INTEGER, b TEXT)')
+	conn.executemany('INSERT INTO t VALUES (?, ?)', [(i, str(i % 7)) for i in range(500)])
+	# Records written before the column was added are shorter than the schema
+	conn.execute('ALTER TABLE t ADD COLUMN c INTEGER')
+	conn.executemany('INSERT INTO t VALUES (?, ?, ?)', [(i, str(i % 7), i % 3) for i in range(500, 1000)])
+	conn.commit()
+	with open_database(db_file) as f:
+		table = Table(f, "t")
+		for column, low, high in [("c", 1, 1), ("c", 0, 2), ("b", "3", "3")]:
+			expected = conn.execute('SELECT a FROM t WHERE ' + column + ' BETWEEN ? AND ? ORDER BY rowid', (low, high)).fetchall()
+			assert [record[0] for record in vectorized_scan(f, table, column, low, high)] == [row[0] for row in expected]
+	conn.close()
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import pytest
+from pager import open_database
+from catalog import get_catalog
+from cursor import Table
+
+def create_wal_table(db_file):
+	'''
+	Create a table in WAL mode with automatic checkpoints turned off, so that every change
+	stays in the -wal file until it is checkpointed explicitly
+	'''
+	conn = sqlite3.connect(db_file, isolation_level=None)
+	conn.execute('PRAGMA page_size = 1024')
+	conn.execute('PRAGMA journal_mode = WAL')
+	conn.execute('PRAGMA wal_autocheckpoint = 0')
+	conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT, n INTEGER)')
+	conn.execute('BEGIN')
+	conn.executemany('INSERT INTO t VALUES (?, ?, ?)', [(i, "name" + str(i), i * 3) for i in range(1, 2001)])
+	conn.execute('COMMIT')
+	return conn
+
+def check_rows(f, conn):
+	get_catalog(f)
+	assert [list(record) for record in Table(f, "t").rows()] == [list(row) for row in conn.execute('SELECT * FROM t ORDER BY id')]
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_wal_round_trip(tmp_path, use_mmap):
+	db_file = str(tmp_path / "wal.db")
+	conn = create_wal_table(db_file)
+	assert os.path.getsize(db_file + "-wal") > 0
+	with open_database(db_file, use_mmap=use_mmap) as f:
+		# Uncheckpointed: every row is only in the WAL
+		check_rows(f, conn)
+		conn.execute('UPDATE t SET name = ? WHERE id % 7 = 0', ("changed",))
+		conn.execute('DELETE FROM t WHERE id % 11 = 0')
+		conn.execute('INSERT INTO t VALUES (5000, ?, 1)', ("x" * 3000,))
+		check_rows(f, conn)
+
+		# Checkpointed into the database file, with the WAL kept
+		conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+		check_rows(f, conn)
+		# Frames written after a restart replace the ones of the previous WAL
+		conn.execute('PRAGMA wal_checkpoint(RESTART)')
+		conn.execute('UPDATE t SET n = -1 WHERE id < 10')
+		check_rows(f, conn)
+
+		# Checkpointed and truncated: every row is in the database file
+		conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+		assert os.path.getsize(db_file + "-wal") == 0
+		check_rows(f, conn)
+	conn.close()
+
+def test_wal_uncommitted_tail(tmp_path):
+	db_file = str(tmp_path / "wal.db")
+	conn = create_wal_table(db_file)
+	conn.execute('UPDATE t SET name = ? WHERE id = 1', ("last",))
+	# Copy the database and its WAL before closing the connection checkpoints them
+	copy_file = str(tmp_path / "copy.db")
+	with open(db_file, 'rb') as db, open(copy_file, 'wb') as copy:
+		copy.write(db.read())
+	with open(db_file + "-wal", 'rb') as wal:
+		data = wal.read()
+	conn.close()
+
+	# A torn last frame drops the last transaction
+	with open(copy_file + "-wal", 'wb') as wal:
+		wal.write(data[:-100])
+	with open_database(copy_file) as f:
+		assert list(Table(f, "t").get(1)) == [1, "name1", 3]
+
+	with open(copy_file + "-wal", 'wb') as wal:
+		wal.write(data)
+	with open_database(copy_file) as f:
+		assert list(Table(f, "t").get(1)) == [1, "last", 3]
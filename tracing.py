@@ -0,0 +1,160 @@
+import os
+import json
+import threading
+import timeit
+
+class Hooks:
+	'''
+	Hooks called by the traversals of helper.py on the Pager they read (file.tracer) while
+	it is set. Pages are entered and exited in nested order by each thread: exiting a page
+	also exits the pages entered after it that are still open (e.g. the path of a
+	descent that returned from a leaf). The methods do nothing; subclasses override the ones
+	they need.
+	'''
+
+	def page_enter(self, page, page_type):
+		'''
+		Called when a page of one of stats.PAGE_TYPES (None for another type) is entered
+		'''
+		pass
+
+	def page_exit(self, page):
+		'''
+		Called when the traversal is done with page
+		'''
+		pass
+
+	def cell_decode(self):
+		'''
+		Called when a record is decoded from a cell of the current page
+		'''
+		pass
+
+	def row_match(self):
+		'''
+		Called when a row of the current page matches the query
+		'''
+		pass
+
+class Frame:
+	'''
+	A page a thread is on, with what was counted on it
+	'''
+
+	def __init__(self, page, page_type, depth, start):
+		self.page = page
+		self.page_type = page_type
+		self.depth = depth
+		self.start = start
+		# Time spent in the pages entered from this one
+		self.children = 0.0
+		self.cells = 0
+		self.rows = 0
+
+class Tracer(Hooks):
+	'''
+	Records every page visit as a span (page number, page type, depth in the traversal,
+	duration, cells decoded and rows matched on the page), and writes them as Chrome
+	trace events (for Perfetto or chrome://tracing) or as folded stacks (for flamegraph.pl
+	and speedscope).
+	'''
+
+	def __init__(self):
+		self.start = timeit.default_timer()
+		# Chrome trace events of the pages exited so far
+		self.events = []
+		# Time spent on each path of pages (tuple of (page type, page)), excluding their children
+		self.paths = {}
+		self.lock = threading.Lock()
+		# Pages each thread is on
+		self.current = threading.local()
+
+	def get_stack(self):
+		stack = getattr(self.current, 'stack', None)
+		if stack is None:
+			stack = self.current.stack = []
+		return stack
+
+	def page_enter(self, page, page_type):
+		stack = self.get_stack()
+		stack.append(Frame(page, page_type, len(stack), timeit.default_timer()))
+
+	def page_exit(self, page):
+		stack = self.get_stack()
+		# Pages entered after page are exited with it
+		depth = len(stack) - 1
+		while depth >= 0 and stack[depth].page != page:
+			depth -= 1
+		if depth < 0:
+			return
+		now = timeit.default_timer()
+		while len(stack) > depth:
+			self.exit_frame(stack, now)
+
+	def exit_frame(self, stack, now):
+		'''
+		Pop the top frame of a thread's stack and record its span
+		'''
+		path = tuple((frame.page_type, frame.page) for frame in stack)
+		frame = stack.pop()
+		duration = now - frame.start
+		if stack:
+			stack[-1].children += duration
+		event = {
+			"name": str(frame.page_type) + " " + str(frame.page),
+			"cat": str(frame.page_type),
+			"ph": "X",
+			"ts": (frame.start - self.start) * 1e6,
+			"dur": duration * 1e6,
+			"pid": os.getpid(),
+			"tid": threading.get_ident(),
+			"args": {
+				"page": frame.page,
+				"page_type": frame.page_type,
+				"depth": frame.depth,
+				"cells_decoded": frame.cells,
+				"rows_matched": frame.rows
+			}
+		}
+		with self.lock:
+			self.events.append(event)
+			self.paths[path] = self.paths.get(path, 0.0) + duration - frame.children
+
+	def cell_decode(self):
+		stack = self.get_stack()
+		if stack:
+			stack[-1].cells += 1
+
+	def row_match(self):
+		stack = self.get_stack()
+		if stack:
+			stack[-1].rows += 1
+
+	def write_chrome_trace(self, path):
+		'''
+		Write the spans as a Chrome trace-event JSON file, to open in https://ui.perfetto.dev
+		'''
+		with self.lock:
+			events = sorted(self.events, key=lambda event: event["ts"])
+		with open(path, 'w') as out:
+			json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, out)
+
+	def write_folded(self, path, by_page=True):
+		'''
+		Write the time spent on each path of pages as folded stacks, one
+		"frame;frame;frame microseconds" line per path, to render with flamegraph.pl.
+		With by_page, frames are "<page type> <page number>"; otherwise they are the page
+		type only, so that the pages at the same depth of a b-tree are added together.
+		'''
+		folded = {}
+		with self.lock:
+			for frames, duration in self.paths.items():
+				if by_page:
+					names = [str(page_type) + " " + str(page) for page_type, page in frames]
+				else:
+					names = [str(page_type) for page_type, _ in frames]
+				stack = ";".join(names)
+				folded[stack] = folded.get(stack, 0.0) + duration
+		with open(path, 'w') as out:
+			for stack in sorted(folded):
+				out.write(stack + " " + str(round(folded[stack] * 1e6)) + "\n")
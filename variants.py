@@ -0,0 +1,209 @@
+import os
+import json
+import random
+import sqlite3
+import tempfile
+import timeit
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+from commands import (table_name, col_limit, load_pragmas, create_database, commit_and_close, reformat_name,
+	read_csv, read_spill, bulk_load)
+
+# Forms of the table
+ROWID = "rowid"
+# Emp_ID INT PRIMARY KEY: a rowid table with an automatic index on Emp_ID (like q3c_db.db)
+PRIMARY_KEY = "primary key"
+# Emp_ID INTEGER PRIMARY KEY: Emp_ID is the rowid
+INTEGER_PRIMARY_KEY = "integer primary key"
+# Emp_ID INT PRIMARY KEY, WITHOUT ROWID (like q3d_db.db)
+WITHOUT_ROWID = "without rowid"
+
+# (declaration of the Emp_ID column, options following the CREATE TABLE statement, short name)
+TABLE_FORMS = {
+	ROWID: ("INT", "", "rowid"),
+	PRIMARY_KEY: ("INT PRIMARY KEY", "", "pk"),
+	INTEGER_PRIMARY_KEY: ("INTEGER PRIMARY KEY", "", "ipk"),
+	WITHOUT_ROWID: ("INT PRIMARY KEY", " WITHOUT ROWID", "wr")
+}
+
+# Orders the rows are inserted in
+CSV_ORDER = "csv"
+SORTED = "sorted"
+RANDOM = "random"
+
+# ORDER BY clause of each order, on the staging table
+ORDER_BY = {
+	CSV_ORDER: "position",
+	SORTED: "CAST(Emp_ID AS INTEGER)",
+	RANDOM: "shuffle"
+}
+
+# Table of the staging database holding the rows of the CSV file, with their position in the
+# file and a random key for the RANDOM order
+STAGING_TABLE = "Staging"
+
+def get_variants(page_sizes, table_forms, index_sets, orders):
+	'''
+	Return every combination of the matrix as a dict of (name, page_size, table_form,
+	indexes, order)
+	INPUT: page_sizes: list of page sizes (powers of 2 from 512 to 65536)
+		table_forms: list of ROWID, PRIMARY_KEY, INTEGER_PRIMARY_KEY, WITHOUT_ROWID
+		index_sets: list of secondary indexes to create, each a list of column lists,
+			e.g. [[], [["Last_Name"], ["Last_Name", "First_Name"]]]
+		orders: list of CSV_ORDER, SORTED, RANDOM
+	'''
+	variants = []
+	for page_size, table_form, indexes, order in product(page_sizes, table_forms, index_sets, orders):
+		if page_size < 512 or page_size > 65536 or page_size & (page_size - 1):
+			exit("Page size " + str(page_size) + " is not a power of 2 between 512 and 65536. Exiting.")
+		if table_form not in TABLE_FORMS:
+			exit("Unknown table form " + str(table_form) + ". Exiting.")
+		if order not in ORDER_BY:
+			exit("Unknown insertion order " + str(order) + ". Exiting.")
+		name = TABLE_FORMS[table_form][2] + "_" + str(page_size) + "_" + order
+		for columns in indexes:
+			name += "_" + "_".join(columns)
+		variants.append({
+			"name": name,
+			"page_size": page_size,
+			"table_form": table_form,
+			"indexes": indexes,
+			"order": order
+		})
+	return variants
+
+def build_staging(staging_file, column_names, max_count, spill_file, seed):
+	'''
+	Load the rows of the spill file (see commands.read_csv) into STAGING_TABLE of a new
+	database, with their position in the CSV file and a random key drawn from seed
+	'''
+	conn, c = create_database(staging_file, 65536)
+	cols = ", ".join(reformat_name(col) for col in column_names[:col_limit])
+	c.execute('CREATE TABLE {tn} (position INTEGER PRIMARY KEY, shuffle INTEGER, {cols})'
+		.format(tn=STAGING_TABLE, cols=cols))
+	commit_and_close(conn)
+
+	shuffle = random.Random(seed)
+	rows = ([position, shuffle.getrandbits(62)] + row for position, row in enumerate(read_spill(spill_file, max_count)))
+	bulk_load(staging_file, STAGING_TABLE, ["position", "shuffle"] + column_names[:col_limit], rows)
+
+def build_variant(db_file, variant, column_names, max_count, staging_file):
+	'''
+	Create the database of one variant from the staging database (run by the worker processes)
+	OUTPUT: dict of the variant with its db file, number of rows and pages, file size and build time
+	'''
+	start = timeit.default_timer()
+	key_declaration, table_options, _ = TABLE_FORMS[variant["table_form"]]
+	conn, c = create_database(db_file, variant["page_size"])
+
+	col_declarations = ""
+	# column Emp_ID
+	col_declarations += "{nom} {key}, ".format(nom=reformat_name(column_names[0]), key=key_declaration)
+	# Rest of the columns
+	for col in column_names[1:col_limit]:
+		col_declarations += "{nom} CHAR({l}), ".format(nom=reformat_name(col), l=max_count[col])
+	col_declarations = col_declarations[:-2]
+	c.execute('CREATE TABLE {tn} ({cols}){options}'
+		.format(tn=table_name, cols=col_declarations, options=table_options))
+	commit_and_close(conn)
+
+	# Rows are copied by SQLite, sorted on disk if needed
+	conn = sqlite3.connect(db_file, isolation_level=None)
+	c = conn.cursor()
+	for pragma, value in load_pragmas.items():
+		c.execute('PRAGMA {pragma} = {value}'.format(pragma=pragma, value=value))
+	c.execute('ATTACH DATABASE ? AS staging', (staging_file,))
+	cols = ", ".join(reformat_name(col) for col in column_names[:col_limit])
+	c.execute('BEGIN')
+	c.execute('INSERT INTO {tn} ({cols}) SELECT {cols} FROM staging.{staging} ORDER BY {order}'
+		.format(tn=table_name, cols=cols, staging=STAGING_TABLE, order=ORDER_BY[variant["order"]]))
+	for columns in variant["indexes"]:
+		c.execute('CREATE INDEX {name} ON {tn} ({cols})'
+			.format(name="idx_" + "_".join(columns), tn=table_name, cols=", ".join(columns)))
+	c.execute('COMMIT')
+	c.execute('DETACH DATABASE staging')
+	rows = c.execute('SELECT COUNT(*) FROM {tn}'.format(tn=table_name)).fetchone()[0]
+	pages = c.execute('PRAGMA page_count').fetchone()[0]
+	conn.close()
+
+	result = dict(variant)
+	result.update({
+		"db_file": os.path.basename(db_file),
+		"table": table_name,
+		"rows": rows,
+		"pages": pages,
+		"file_size": os.path.getsize(db_file),
+		"build_seconds": timeit.default_timer() - start
+	})
+	print(result["name"] + ": " + str(rows) + " rows, " + str(pages) + " pages in " +
+		str(round(result["build_seconds"], 3)) + " s")
+	return result
+
+def build_matrix(csv_file, directory, variants, seed=0, workers=1):
+	'''
+	Build the database of every variant (see get_variants) in directory from a single pass over
+	the CSV file, and write the list of variants to directory/manifest.json
+	INPUT: csv_file: csv file that stores data to be inserted into the databases
+		directory: directory the databases and manifest are written to
+		variants: list of variants, as returned by get_variants
+		seed: seed of the RANDOM insertion order
+		workers: number of processes building databases at the same time
+	OUTPUT: path to the manifest
+	'''
+	os.makedirs(directory, exist_ok=True)
+	start = timeit.default_timer()
+
+	spill_fd, spill_filename = tempfile.mkstemp(suffix=".spill")
+	os.close(spill_fd)
+	staging_filename = os.path.join(directory, "staging.db")
+	try:
+		column_names, max_count, num_rows = read_csv(csv_file, spill_filename)
+		print(str(num_rows) + " rows read from " + csv_file)
+		build_staging(staging_filename, column_names, max_count, spill_filename, seed)
+		os.remove(spill_filename)
+
+		db_files = [os.path.join(directory, variant["name"] + ".db") for variant in variants]
+		if workers > 1:
+			with ProcessPoolExecutor(max_workers=workers) as executor:
+				futures = [executor.submit(build_variant, db_file, variant, column_names, max_count, staging_filename)
+					for db_file, variant in zip(db_files, variants)]
+				results = [future.result() for future in futures]
+		else:
+			results = [build_variant(db_file, variant, column_names, max_count, staging_filename)
+				for db_file, variant in zip(db_files, variants)]
+	finally:
+		for path in (spill_filename, staging_filename):
+			if os.path.exists(path):
+				os.remove(path)
+
+	manifest = os.path.join(directory, "manifest.json")
+	with open(manifest, 'w') as out:
+		json.dump({
+			"csv_file": csv_file,
+			"seed": seed,
+			"variants": results
+		}, out, indent=4)
+	print(str(len(results)) + " databases built in " + str(round(timeit.default_timer() - start, 3)) +
+		" s, manifest written to " + manifest)
+	return manifest
+
+if __name__ == "__main__":
+	#################### Input info ####################
+	csv_filename = "500000 Records.csv"
+	# Directory the databases and manifest.json are written to
+	output_directory = "variants"
+
+	# Matrix of variants: one database is built for every combination
+	page_sizes = [1024, 4096, 16384, 65536]
+	table_forms = [ROWID, PRIMARY_KEY, INTEGER_PRIMARY_KEY, WITHOUT_ROWID]
+	# Each entry is the list of secondary indexes of a variant (each a list of columns)
+	index_sets = [[], [["Last_Name"]]]
+	orders = [CSV_ORDER]
+
+	# Seed of the random insertion order
+	seed = 0
+	# Number of processes building the databases at the same time
+	workers = os.cpu_count() or 1
+	####################################################
+
+	build_matrix(csv_filename, output_directory, get_variants(page_sizes, table_forms, index_sets, orders), seed, workers)
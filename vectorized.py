@@ -0,0 +1,207 @@
+from helper import *
+
+# NumPy is optional: without it, every page is matched one cell at a time
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+if np is not None:
+	# Content size of the serial types that fit in one header byte (0-127), 0 for the ones
+	# that are not fixed-size integers or text/blobs of that length
+	SERIAL_SIZES = np.array([get_serial_type_size(serial) if serial not in (10, 11) else 0
+		for serial in range(128)], dtype=np.int64)
+
+# Range of the integers held by the arrays
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+def get_varint_sizes(arr, offsets):
+	'''
+	Return the number of bytes of the varints starting at each of offsets in the page arr
+	'''
+	sizes = np.ones(len(offsets), dtype=np.int64)
+	going = arr[offsets] >= 0x80
+	for i in range(1, 9):
+		if not going.any():
+			break
+		sizes += going
+		going &= arr[np.minimum(offsets + i, len(arr) - 1)] >= 0x80
+	return sizes
+
+def decode_cells(file, data, page, position):
+	'''
+	Locate column position in every cell of a table leaf page with vectorized operations.
+
+	INPUT: file: Pager over the database file to be read
+		data: contents of the page
+		page: page number
+		position: position of the column in the records
+	OUTPUT: (page as a uint8 array, serial type of the column in each cell, offset of the column
+		content in each cell, mask of the cells that could not be decoded this way and must
+		be read one at a time)
+	'''
+	arr = np.frombuffer(data, dtype=np.uint8)
+	hdr = get_page_hdr_offset(page)
+	num_cells = read_int(data, hdr + 3, 2)
+	offset_to_ptr_arr = hdr + get_b_tree_hdr_size(TABLE_LEAF)
+
+	# Cell pointer array is num_cells big-endian 2-byte offsets
+	cells = np.frombuffer(data, dtype='>u2', count=num_cells, offset=offset_to_ptr_arr).astype(np.int64)
+
+	# Table leaf cells are: payload size varint, rowid varint, record header, record body
+	payload_sizes = get_varint_sizes(arr, cells)
+	payloads = arr[cells].astype(np.int64)
+	second = arr[np.minimum(cells + 1, len(arr) - 1)].astype(np.int64)
+	payloads = np.where(payload_sizes == 2, (payloads & 0x7f) << 7 | second, payloads)
+	# Payloads of more than 2 varint bytes or larger than this spill onto overflow pages
+	unknown = (payload_sizes > 2) | (payloads > file.usable_size - 35)
+	header = cells + payload_sizes + get_varint_sizes(arr, cells + payload_sizes)
+	header = np.minimum(header, len(arr) - 1)
+
+	# Only single byte header sizes and serial types have a fixed position in the header
+	hdr_len = arr[header].astype(np.int64)
+	unknown |= (hdr_len >= 0x80) | (hdr_len <= position + 1)
+	body = header + hdr_len
+	for column in range(position + 1):
+		serials = arr[np.minimum(header + 1 + column, len(arr) - 1)]
+		unknown |= serials >= 0x80
+		if (column < position):
+			body += SERIAL_SIZES[serials & 0x7f]
+	serials = serials.astype(np.int64)
+	return arr, serials, body, unknown
+
+def match_text(arr, serials, body, literal):
+	'''
+	Return the mask of the cells whose column (serial type and content offset from
+	decode_cells) is the text literal (already encoded)
+	'''
+	mask = serials == 13 + 2 * len(literal)
+	if not mask.any() or len(literal) == 0:
+		return mask
+	# Gather the bytes of the column of every cell and compare them to the literal at once
+	starts = np.where(mask, body, 0)
+	content = arr[np.minimum(starts[:, None] + np.arange(len(literal)), len(arr) - 1)]
+	return mask & (content == np.frombuffer(literal, dtype=np.uint8)).all(axis=1)
+
+def decode_integers(arr, serials, body):
+	'''
+	Return the value of the integer column of every cell (serial type and content offset from
+	decode_cells), and the mask of the cells where the column is an integer of at most 6 bytes
+	'''
+	is_integer = ((serials >= 1) & (serials <= 5)) | (serials == 8) | (serials == 9)
+	sizes = np.where(is_integer, SERIAL_SIZES[serials & 0x7f], 0)
+	values = np.zeros(len(serials), dtype=np.int64)
+	for i in range(6):
+		byte = arr[np.minimum(body + i, len(arr) - 1)].astype(np.int64)
+		values = np.where(i < sizes, (values << 8) | byte, values)
+	# Integers are twos complement: subtract 2^bits when the sign bit is set
+	bits = np.maximum(sizes, 1) * 8
+	negative = (sizes > 0) & (values >= (np.int64(1) << (bits - 1)))
+	values = np.where(negative, values - (np.int64(1) << bits), values)
+	# Serial types 8 and 9 are the constants 0 and 1
+	values = np.where(serials == 9, 1, np.where(serials == 8, 0, values))
+	return values, is_integer
+
+def match_page(file, data, page, position, low, high=None):
+	'''
+	Compute which cells of a table leaf page have column position equal to low (text or
+	integer), or between low and high (integers), using vectorized gathers and comparisons
+	over all the cells of the page.
+	OUTPUT: (mask of the matching cells, mask of the cells that must be checked one at a time),
+		or None if NumPy is not available or the comparison is not supported
+	'''
+	if np is None:
+		return None
+	if isinstance(low, (str, bytes)) and high is not None and high != low:
+		# Text and blobs are only matched for equality
+		return None
+	if not isinstance(low, (str, bytes, int)) or not isinstance(high, (int, type(None))):
+		# NULL and floats are compared one cell at a time
+		return None
+	if isinstance(low, int) and not (INT64_MIN <= low and (high or low) <= INT64_MAX):
+		return None
+	arr, serials, body, unknown = decode_cells(file, data, page, position)
+	if isinstance(low, str):
+		mask = match_text(arr, serials, body, low.encode(file.encoding))
+	elif isinstance(low, bytes):
+		# Blobs have even serial types, so compare them as text of serial type + 1
+		mask = match_text(arr, serials + 1, body, low)
+	else:
+		if high is None:
+			high = low
+		values, is_integer = decode_integers(arr, serials, body)
+		mask = is_integer & (values >= low) & (values <= high)
+		# Floats and large integers are compared one at a time
+		unknown |= (serials == 6) | (serials == 7)
+	return mask & ~unknown, unknown
+
+def matches(value, low, high):
+	'''
+	Return True if value equals low, or is a number between low and high
+	'''
+	if low == high:
+		return value == low
+	return isinstance(value, (int, float)) and low <= value <= high
+
+def iter_table_leaves(file, page):
+	'''
+	Generate (page number, contents) for every leaf of the table b-tree rooted at page, in
+	rowid order
+	'''
+	pg_type = get_b_tree_type(file, page)
+	if (pg_type != TABLE_INTERIOR and pg_type != TABLE_LEAF):
+		exit("Page " + str(page) + " is not a table b-tree page. Exiting.")
+	count_page(file, pg_type, page)
+	data = file.get_page(page)
+	try:
+		if (pg_type == TABLE_LEAF):
+			yield page, data
+			return
+
+		offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
+		for ptr in range(0, get_num_cells(file, page) * 2, 2):
+			yield from iter_table_leaves(file, get_left_children(data, get_cell_offset(data, offset_to_ptr_arr, ptr)))
+		yield from iter_table_leaves(file, get_right_children(file, page))
+	finally:
+		leave_page(file, page)
+
+def vectorized_scan(file, table, column, low, high=None):
+	'''
+	Scan a table (cursor.Table with a rowid) for the records whose column equals low (or is
+	between low and high for integers). Every leaf page is matched at once with match_page,
+	and only the records of the matching cells are decoded. Cells that match_page cannot
+	handle (and every cell if NumPy is not available) are checked one at a time.
+	Generates the matching records in rowid order.
+	'''
+	position = table.column_position(column)
+	if (high is None):
+		high = low
+
+	for page, data in iter_table_leaves(file, table.entry.rootpage):
+		offset_to_ptr_arr = offset_to_cell_ptr_arr(file, page)
+		num_cells = get_num_cells(file, page)
+		result = None
+		if (table.rowid_alias != position):
+			# The rowid alias column is stored as NULL, so it can only be matched on rowids
+			result = match_page(file, data, page, position, low, high)
+		if result is None:
+			cells = range(num_cells)
+			unknown = None
+		else:
+			mask, unknown = result
+			cells = np.flatnonzero(mask | unknown)
+
+		for cell in cells:
+			cell_offset = get_cell_offset(data, offset_to_ptr_arr, int(cell) * 2)
+			record = table.with_rowid(get_cell_rowid(data, cell_offset, TABLE_LEAF),
+				get_cell_record(file, data, cell_offset, TABLE_LEAF))
+			if unknown is not None and not unknown[cell]:
+				# Already known to match
+				match_row(file)
+				yield record
+				continue
+			# Columns added after the record was written are NULL
+			if matches(record[position] if position < len(record) else None, low, high):
+				match_row(file)
+				yield record
@@ -0,0 +1,141 @@
+import os
+import struct
+
+# Size of the header at the start of the WAL file, and of the header of every frame
+WAL_HEADER_SIZE = 32
+FRAME_HEADER_SIZE = 24
+
+# Magic numbers of WAL files: checksums are computed on big-endian words if the last bit is set,
+# and on little-endian words otherwise
+WAL_MAGIC = (0x377f0682, 0x377f0683)
+
+def wal_checksum(data, s0, s1, big_endian):
+	'''
+	Continue the checksum (s0, s1) of the WAL over data (a multiple of 8 bytes), as specified
+	in the "WAL File Format" section of the SQLite docs
+	OUTPUT: (s0, s1)
+	'''
+	words = struct.unpack(('>' if big_endian else '<') + str(len(data) // 4) + 'I', data)
+	for i in range(0, len(words), 2):
+		s0 = (s0 + words[i] + s1) & 0xffffffff
+		s1 = (s1 + words[i + 1] + s0) & 0xffffffff
+	return s0, s1
+
+class Wal:
+	'''
+	Write-ahead log (the -wal file) of a database in WAL mode. Pages written by transactions that
+	are not checkpointed yet are in its frames; the latest frame of a page, up to the last
+	commit frame, holds its current contents. Frames are checked with the salts and cumulative
+	checksums of the WAL, and reading stops at the first invalid frame like SQLite does.
+
+	frames maps every page in the WAL to the offset of the contents of its latest committed
+	frame. update reads only the frames appended since it was last called.
+	'''
+
+	def __init__(self, path):
+		'''
+		INPUT: path: path to the -wal file
+		'''
+		self.path = path
+		# Unbuffered, since the WAL is appended to and rewritten by other processes
+		self.file = open(path, 'rb', buffering=0)
+		self.reset()
+		self.update()
+
+	def reset(self):
+		'''
+		Forget every frame read so far
+		'''
+		# (magic, version, page size, checkpoint sequence number, salt-1, salt-2, checksum-1,
+		# checksum-2), None if the WAL has no valid header
+		self.header = None
+		self.page_size = None
+		self.frames = {}
+		# Offset after the last commit frame, and checksum up to it
+		self.end = WAL_HEADER_SIZE
+		self.checksum = None
+		# Size of the database in pages after the last commit (None if no commit)
+		self.db_pages = None
+
+	def read_header(self):
+		'''
+		Return the fields of the WAL header, or None if the header is missing or invalid
+		'''
+		self.file.seek(0)
+		header = self.file.read(WAL_HEADER_SIZE)
+		if len(header) < WAL_HEADER_SIZE:
+			return None
+		fields = struct.unpack('>8I', header)
+		if fields[0] not in WAL_MAGIC:
+			return None
+		if wal_checksum(header[:24], 0, 0, fields[0] & 1) != fields[6:8]:
+			return None
+		return fields
+
+	def update(self):
+		'''
+		Read the frames committed since the last call. If the WAL was restarted (new salts,
+		e.g. after a checkpoint) or truncated, every frame is read again.
+		OUTPUT: set of pages with a new committed frame, or None if the WAL was restarted
+			(every page may have changed)
+		'''
+		restarted = False
+		header = self.read_header()
+		size = os.fstat(self.file.fileno()).st_size
+		if header != self.header or size < self.end:
+			restarted = self.header is not None or bool(self.frames)
+			self.reset()
+			self.header = header
+			if header is None:
+				return None if restarted else set()
+			self.page_size = header[2]
+			# The checksum of the first frame continues from the checksum of the header
+			self.checksum = header[6:8]
+
+		big_endian = self.header[0] & 1
+		salts = self.header[4:6]
+		frame_size = FRAME_HEADER_SIZE + self.page_size
+		changed = set()
+		# Frames after the last commit frame, committed once a commit frame is found
+		pending = {}
+		checksum = self.checksum
+		offset = self.end
+		self.file.seek(offset)
+		while offset + frame_size <= size:
+			frame = self.file.read(frame_size)
+			if len(frame) < frame_size:
+				break
+			page, db_pages, salt1, salt2, check1, check2 = struct.unpack('>6I', frame[:FRAME_HEADER_SIZE])
+			if (salt1, salt2) != salts:
+				break
+			checksum = wal_checksum(frame[:8], checksum[0], checksum[1], big_endian)
+			checksum = wal_checksum(frame[FRAME_HEADER_SIZE:], checksum[0], checksum[1], big_endian)
+			if checksum != (check1, check2):
+				break
+			pending[page] = offset + FRAME_HEADER_SIZE
+			offset += frame_size
+			if db_pages != 0:
+				# Commit frame: the transaction is complete
+				self.frames.update(pending)
+				changed.update(pending)
+				pending = {}
+				self.end = offset
+				self.checksum = checksum
+				self.db_pages = db_pages
+
+		if restarted:
+			return None
+		return changed
+
+	def read_page(self, page):
+		'''
+		Return the contents of page in its latest committed frame (None if it has no frame)
+		'''
+		offset = self.frames.get(page)
+		if offset is None:
+			return None
+		self.file.seek(offset)
+		return self.file.read(self.page_size)
+
+	def close(self):
+		self.file.close()